@@ -0,0 +1,165 @@
+"""数独求解性能基准
+
+用法：
+    python -m bench.run                        # 运行全部题库并打印结果
+    python -m bench.run --save baseline.json   # 把结果保存为基线
+    python -m bench.run --compare baseline.json --tolerance 0.15
+
+题库位于 bench/corpora/*.txt，每行一个81字符的题目。每个题目分别用两种模式求解：
+    steps  逐步调用 solve_step，逻辑方法无法继续时回退到 solve_search
+    full   trace=False 的 solve()，即批量求解使用的路径
+两种模式都用 stats=True 求解，各方法的调用次数、命中次数、扫描格子数和耗时取自 SolverStats，
+每次调用单独计时，没有找到步骤的扫描计入被扫描的方法本身。
+与基线比较时，若解题速度下降或 p99 延迟上升超过容差，会标记为性能回退并以状态码1退出。
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+from solver.board import SudokuBoard
+from solver.cli import read_puzzles
+from solver.stats import SolverStats
+
+CORPORA_DIR = Path(__file__).parent / 'corpora'
+
+
+def load_corpora(names=None):
+    """读取题库，返回 {题库名: 题目列表}"""
+    corpora = {}
+    for path in sorted(CORPORA_DIR.glob('*.txt')):
+        if names and path.stem not in names:
+            continue
+        with open(path, encoding='utf-8') as file:
+            corpora[path.stem] = list(read_puzzles(file))
+    return corpora
+
+
+def percentile(sorted_values, fraction):
+    """最近秩法计算分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def run_steps(puzzle, stats):
+    """逐步求解一个题目，各方法的统计记入 stats"""
+    solver = SudokuBoard.from_string(puzzle, stats=stats)
+    while not solver.is_solved():
+        if not (solver.solve_step() or solver.solve_search()):
+            return False
+    return True
+
+
+def run_full(puzzle, stats):
+    """用批量求解的路径完整求解一个题目"""
+    return SudokuBoard.from_string(puzzle, trace=False, stats=stats).solve()
+
+
+MODES = {'steps': run_steps, 'full': run_full}
+
+
+def bench_corpus(puzzles, mode, repeat):
+    """对一个题库运行 repeat 轮，返回统计结果"""
+    run = MODES[mode]
+    stats = SolverStats()
+    latencies = []
+    solved = 0
+    clock = time.perf_counter
+    total_start = clock()
+    for _ in range(repeat):
+        for puzzle in puzzles:
+            start = clock()
+            solved += bool(run(puzzle, stats))
+            latencies.append(clock() - start)
+    total = clock() - total_start
+    latencies.sort()
+    return {
+        'puzzles': len(puzzles) * repeat,
+        'solved': solved,
+        'seconds': total,
+        'puzzles_per_sec': len(latencies) / total if total else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': latencies[-1] * 1000 if latencies else 0.0,
+        'techniques': {
+            name: {'calls': record['calls'], 'hits': record['hits'], 'cells': record['cells'],
+                   'ms': record['seconds'] * 1000}
+            for name, record in sorted(stats.to_dict().items())
+        },
+    }
+
+
+def run_benchmarks(corpora, modes, repeat):
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': repeat,
+        'results': {
+            name: {mode: bench_corpus(puzzles, mode, repeat) for mode in modes}
+            for name, puzzles in corpora.items()
+        },
+    }
+
+
+def compare(report, baseline, tolerance):
+    """与基线比较，返回性能回退的说明列表"""
+    regressions = []
+    for name, modes in report['results'].items():
+        for mode, result in modes.items():
+            base = baseline.get('results', {}).get(name, {}).get(mode)
+            if not base:
+                continue
+            if result['puzzles_per_sec'] < base['puzzles_per_sec'] * (1 - tolerance):
+                regressions.append(f"{name}/{mode}: 速度 {base['puzzles_per_sec']:.1f} -> "
+                                   f"{result['puzzles_per_sec']:.1f} 题/秒")
+            if result['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+                regressions.append(f"{name}/{mode}: p99 {base['p99_ms']:.2f} -> {result['p99_ms']:.2f} ms")
+            if result['solved'] < base['solved'] * result['puzzles'] / max(base['puzzles'], 1):
+                regressions.append(f"{name}/{mode}: 解出题数 {base['solved']} -> {result['solved']}")
+    return regressions
+
+
+def print_report(report, out=sys.stdout):
+    for name, modes in report['results'].items():
+        for mode, result in modes.items():
+            print(f"{name:<14}{mode:<7}{result['puzzles_per_sec']:>10.1f} 题/秒  "
+                  f"p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  "
+                  f"解出 {result['solved']}/{result['puzzles']}", file=out)
+            for technique, stats in result['techniques'].items():
+                print(f"{'':<21}{technique:<22}{stats['calls']:>8} 次 {stats['hits']:>8} 中 "
+                      f"{stats['cells']:>10} 格 {stats['ms']:>10.2f} ms", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.run', description='数独求解性能基准')
+    parser.add_argument('--corpus', action='append', help='只运行指定题库，可重复使用')
+    parser.add_argument('--mode', action='append', choices=sorted(MODES), help='只运行指定模式，可重复使用')
+    parser.add_argument('--repeat', type=int, default=3, help='每个题库运行的轮数')
+    parser.add_argument('--save', help='把结果保存为JSON基线')
+    parser.add_argument('--compare', help='与指定的JSON基线比较')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='允许的相对性能波动')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(load_corpora(args.corpus), args.mode or sorted(MODES), args.repeat)
+    print_report(report)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for line in regressions:
+            print(f'性能回退: {line}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
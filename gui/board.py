@@ -1,12 +1,54 @@
 import tkinter as tk
 
+from solver.board import digit_bit, mask_to_digits
+from solver.units import STANDARD, geometry
+
+
+def base_colors(geometry):
+    """每个格子未高亮时的背景色，相邻宫格交替使用浅灰色和白色"""
+    box = geometry.box
+    return tuple('#F0F0F0' if (b // box + b % box) % 2 == 0 else 'white' for b in geometry.box_of)
+
+
+def pencil_text(mask, geometry=STANDARD):
+    """把候选数掩码排成 box x box 的小字文本，没有的数字用空格占位
+
+    9x9及以下的盘面数字之间留一个空格，更大的盘面为了放得下不留空格。
+    """
+    box, chars = geometry.box, geometry.digit_chars
+    sep = ' ' if box <= 3 else ''
+    return '\n'.join(
+        sep.join(chars[num] if mask >> num & 1 else ' ' for num in range(base, base + box))
+        for base in range(0, geometry.size, box)
+    )
+
+
 class SudokuGUI:
-    def __init__(self, master):
+    """由输入框组成的数独面板，box 为宫格边长，默认为9x9的盘面"""
+
+    def __init__(self, master, box=3):
         self.master = master
+        self.geometry = geometry(box)
+        self.size = n = self.geometry.size
+        self.base_colors = base_colors(self.geometry)
         self.cells = {}  # 存储所有输入框
         self.selected_number = None  # 当前选中的数字
         self.showing_candidates = False  # 是否正在显示候选数
         self.candidate_labels = {}  # 存储候选数标签
+
+        # 盘面模型：输入框内容变化时同步更新，读取盘面时不再访问输入框
+        self.values = [0] * (n * n)
+        # 3n个单元（先行、再列、后宫）中已填数字的掩码
+        self.unit_used = [0] * (3 * n)
+        self.variables = {}  # 输入框绑定的 StringVar
+        # 每个格子当前显示的背景色和文字颜色，重绘时只修改颜色有变化的格子
+        self.painted = {'bg': list(self.base_colors), 'fg': ['black'] * (n * n)}
+        self.pencil = [0] * (n * n)  # 当前显示的候选数掩码
+        # 实时候选数：数字变化时只把该格子及其同行、同列、同宫的格子标记为待重算，
+        # 同一轮事件循环中的所有变化在空闲时合并重绘一次
+        self.live_pencil = False
+        self.dirty_pencil = set()
+        self.pencil_pending = None
         self.create_board()
         
         # 绑定Esc键
@@ -22,10 +64,13 @@ class SudokuGUI:
         )
         main_frame.pack(padx=10, pady=10)
         
-        # 创建9个3x3的区块框架
-        for block_i in range(3):
-            for block_j in range(3):
-                # 创建3x3区块的框架
+        box = self.geometry.box
+        # 大盘面使用较小的字体
+        font = ('Arial', 18 if box <= 3 else 12)
+        # 创建 box x box 个区块框架
+        for block_i in range(box):
+            for block_j in range(box):
+                # 创建区块的框架
                 block_frame = tk.Frame(
                     main_frame,
                     bd=2,  # 添加边框
@@ -38,12 +83,12 @@ class SudokuGUI:
                     pady=3   # 区块之间的垂直间距
                 )
                 
-                # 在每个区块中创建3x3的单元格
-                for i in range(3):
-                    for j in range(3):
+                # 在每个区块中创建 box x box 个单元格
+                for i in range(box):
+                    for j in range(box):
                         # 计算实际的行列索引
-                        row = block_i * 3 + i
-                        col = block_j * 3 + j
+                        row = block_i * box + i
+                        col = block_j * box + j
                         
                         # 创建单元格框架
                         cell_frame = tk.Frame(
@@ -58,12 +103,16 @@ class SudokuGUI:
                             pady=1   # 单元格之间的垂直间距
                         )
                         
-                        # 创建输入框
+                        # 创建输入框，内容变化时同步到盘面模型
+                        variable = tk.StringVar(self.master)
+                        variable.trace_add('write', lambda *args, r=row, c=col: self.on_cell_changed(r, c))
+                        self.variables[(row, col)] = variable
                         cell = tk.Entry(
                             cell_frame,
                             width=2,
                             justify='center',
-                            font=('Arial', 18)
+                            font=font,
+                            textvariable=variable
                         )
                         cell.pack(padx=4, pady=4)  # 增加输入框内的边距
                         
@@ -76,14 +125,14 @@ class SudokuGUI:
                         self.cells[(row, col)] = cell
         
         # 为每个单元格创建候选数显示框架
-        for i in range(9):
-            for j in range(9):
+        for i in range(self.size):
+            for j in range(self.size):
                 cell_frame = self.cells[(i, j)].master
                 # 创建候选数标签
                 candidates_label = tk.Label(
                     cell_frame,
                     text="",
-                    font=('Arial', 8),
+                    font=('Courier', 7),
                     justify='left',
                     wraplength=50
                 )
@@ -97,14 +146,8 @@ class SudokuGUI:
     def configure_cell_styles(self):
         """配置单元格的样式"""
         for (row, col), cell in self.cells.items():
-            # 设置背景色
-            if (row // 3 + col // 3) % 2 == 0:
-                cell.configure(bg='#F0F0F0')  # 浅灰色背景
-            else:
-                cell.configure(bg='white')
-            
-            # 设置初始前景色
-            cell.configure(fg='black')
+            # 设置背景色和初始前景色
+            cell.configure(bg=self.base_colors[row * self.size + col], fg='black')
             
             # 设置其他样式
             cell.configure(
@@ -114,8 +157,8 @@ class SudokuGUI:
             )
     
     def validate_input(self, event, i, j):
-        # 只允许输入1-9的数字
-        if event.char in '123456789':
+        # 只允许输入盘面上的数字，大于9的数字为字母
+        if event.char.upper() in self.geometry.digit_chars:
             # 清除当前内容并允许新输入
             self.cells[(i, j)].delete(0, tk.END)
             return True
@@ -133,31 +176,127 @@ class SudokuGUI:
             self.cells[(i, j)].delete(0, tk.END)
             self.cells[(i, j)].insert(0, content[-1])
     
+    def on_cell_changed(self, row, col):
+        """输入框内容变化时更新盘面模型"""
+        content = self.variables[(row, col)].get()
+        # 失去焦点前可能暂时有多个字符，与 on_focus_out 一致取最后一个
+        char = content[-1].upper() if content else ''
+        self.set_value(row * self.size + col,
+                       self.geometry.digit_value(char) if char and char in self.geometry.digit_chars else 0)
+
+    def set_value(self, idx, value):
+        """更新盘面模型中一个格子的数字和所在单元的数字掩码，数字没有变化时返回 False"""
+        if self.values[idx] == value:
+            return False
+        self.values[idx] = value
+        values = self.values
+        for unit in self.geometry.cell_units[idx]:
+            used = 0
+            for peer in self.geometry.units[unit]:
+                if values[peer]:
+                    used |= digit_bit(values[peer])
+            self.unit_used[unit] = used
+        if self.live_pencil:
+            self.dirty_pencil.add(idx)
+            self.dirty_pencil.update(self.geometry.peers[idx])
+            self.schedule_pencil_marks()
+        return True
+
+    def used_digits(self, row, col):
+        """指定格子所在行、列、宫中已填数字的掩码"""
+        row_unit, col_unit, box_unit = self.geometry.cell_units[row * self.size + col]
+        return self.unit_used[row_unit] | self.unit_used[col_unit] | self.unit_used[box_unit]
+
+    def format_mask(self, mask):
+        """把掩码中的数字排成 [1, 2, A] 形式的文本，大于9的数字用字母表示"""
+        chars = self.geometry.digit_chars
+        return '[' + ', '.join(chars[num - 1] for num in mask_to_digits(mask)) + ']'
+
+    def paint(self, colors, option='bg'):
+        """按 (格子序号, 颜色) 设置格子颜色，只重新配置颜色有变化的格子"""
+        painted = self.painted[option]
+        for idx, color in colors:
+            if painted[idx] != color:
+                painted[idx] = color
+                self.cells[self.geometry.positions[idx]].configure({option: color})
+
+    def set_live_pencil_marks(self, enabled):
+        """打开或关闭所有空格的实时候选数显示"""
+        self.live_pencil = enabled
+        if enabled:
+            self.dirty_pencil.update(self.geometry.cells)
+            self.schedule_pencil_marks()
+            return
+        if self.pencil_pending is not None:
+            self.master.after_cancel(self.pencil_pending)
+            self.pencil_pending = None
+        self.dirty_pencil.clear()
+        self.hide_pencil_marks()
+
+    def schedule_pencil_marks(self):
+        """在事件循环空闲时重绘待重算的候选数，已安排时不重复安排"""
+        if self.pencil_pending is None:
+            self.pencil_pending = self.master.after_idle(self.flush_pencil_marks)
+
+    def flush_pencil_marks(self):
+        """重算并重绘所有待重算格子的候选数"""
+        self.pencil_pending = None
+        values, unit_used = self.values, self.unit_used
+        cell_units, all_digits = self.geometry.cell_units, self.geometry.all_digits
+        for idx in self.dirty_pencil:
+            if values[idx]:
+                self.update_pencil_mark(idx, 0)
+            else:
+                row_unit, col_unit, box_unit = cell_units[idx]
+                used = unit_used[row_unit] | unit_used[col_unit] | unit_used[box_unit]
+                self.update_pencil_mark(idx, all_digits & ~used)
+        self.dirty_pencil.clear()
+
+    def show_pencil_marks(self, masks):
+        """显示每个空格的候选数，masks 为每个格子的候选数掩码，只重绘有变化的格子"""
+        for idx, mask in enumerate(masks):
+            self.update_pencil_mark(idx, mask)
+
+    def update_pencil_mark(self, idx, mask):
+        if self.pencil[idx] != mask:
+            self.pencil[idx] = mask
+            self.draw_pencil_mark(idx, mask)
+
+    def hide_pencil_marks(self):
+        self.show_pencil_marks([0] * len(self.values))
+        if self.showing_candidates:
+            for label in self.candidate_labels.values():
+                label.pack_forget()
+            self.showing_candidates = False
+
+    def draw_pencil_mark(self, idx, mask):
+        """在格子下方的候选数标签中显示掩码，标签第一次使用时全部显示出来，盘面布局不再跳动"""
+        if not self.showing_candidates:
+            if not mask:
+                return
+            for label in self.candidate_labels.values():
+                label.config(text=pencil_text(0, self.geometry))
+                label.pack(side='bottom')
+            self.showing_candidates = True
+        self.candidate_labels[self.geometry.positions[idx]].config(text=pencil_text(mask, self.geometry))
+
     def clear_board(self):
         # 清空所有单元格
-        for cell in self.cells.values():
-            cell.delete(0, tk.END)
+        for idx, cell in enumerate(self.cells[position] for position in self.geometry.positions):
+            if self.values[idx]:
+                cell.delete(0, tk.END)
     
     def get_board(self):
         # 获取当前数独板的状态
-        board = []
-        for i in range(9):
-            row = []
-            for j in range(9):
-                value = self.cells[(i, j)].get()
-                row.append(int(value) if value else 0)
-            board.append(row)
-        return board
+        n = self.size
+        return [self.values[row * n:row * n + n] for row in range(n)]
     
     def set_cell(self, i, j, value, highlight=False):
         """设置单元格的值，可选择是否高亮显示"""
         self.cells[(i, j)].delete(0, tk.END)
         if value != 0:
-            self.cells[(i, j)].insert(0, str(value))
-            if highlight:
-                self.cells[(i, j)].config(fg='red')
-            else:
-                self.cells[(i, j)].config(fg='black')
+            self.cells[(i, j)].insert(0, self.geometry.digit_chars[value - 1])
+            self.paint(((i * self.size + j, 'red' if highlight else 'black'),), 'fg')
             
             # 如果当前有选中的数字，更新高亮显示
             if self.selected_number:
@@ -166,18 +305,13 @@ class SudokuGUI:
     def clear_highlights(self, event=None):
         """清除所有高亮显示"""
         self.selected_number = None
-        # 恢复原始背景色
-        for (row, col), cell in self.cells.items():
-            if (row // 3 + col // 3) % 2 == 0:
-                cell.configure(bg='#F0F0F0')  # 浅灰色背景
-            else:
-                cell.configure(bg='white')
-            cell.configure(fg='black')  # 恢复文字颜色
+        # 恢复原始背景色和文字颜色
+        self.paint(enumerate(self.base_colors))
+        self.paint(((idx, 'black') for idx in self.geometry.cells), 'fg')
 
     def on_cell_click(self, event, row, col):
         """处理单元格点击事件"""
-        cell = self.cells[(row, col)]
-        content = cell.get()
+        content = self.values[row * self.size + col]
         
         if content:  # 如果单元格有数字
             if self.selected_number == content:
@@ -191,55 +325,42 @@ class SudokuGUI:
     
     def show_candidates_analysis(self, row, col):
         """显示指定位置的候选数分析"""
-        self.clear_highlights()
-        board = self.get_board()
-        
-        # 获取初始候选数
-        initial_candidates = set(range(1, 10))
-        row_numbers = set(board[row])
-        col_numbers = set(board[i][col] for i in range(9))
-        box_numbers = set()
-        box_row, box_col = 3 * (row // 3), 3 * (col // 3)
-        for i in range(box_row, box_row + 3):
-            for j in range(box_col, box_col + 3):
-                box_numbers.add(board[i][j])
+        self.selected_number = None
+        idx = row * self.size + col
+        row_unit, col_unit, box_unit = self.geometry.cell_units[idx]
+        colors = list(self.base_colors)
         
         # 准备分析文本
         analysis = []
         
-        # 分析行排除
-        row_excluded = initial_candidates & row_numbers
-        if row_excluded:
-            analysis.append(f"行排除: {sorted(row_excluded)}")
-            self.highlight_row(row, '#FFE6E6')  # 浅红色
-        
-        # 分析列排除
-        col_excluded = initial_candidates & col_numbers
-        if col_excluded:
-            analysis.append(f"列排除: {sorted(col_excluded)}")
-            self.highlight_column(col, '#E6FFE6')  # 浅绿色
-        
-        # 分析宫格排除
-        box_excluded = initial_candidates & box_numbers
-        if box_excluded:
-            analysis.append(f"宫格排除: {sorted(box_excluded)}")
-            self.highlight_box(row, col, '#E6E6FF')  # 浅蓝色
+        # 依次分析行、列、宫格排除，后面的单元颜色覆盖前面的
+        for unit, label, color in ((row_unit, '行排除', '#FFE6E6'),      # 浅红色
+                                   (col_unit, '列排除', '#E6FFE6'),      # 浅绿色
+                                   (box_unit, '宫格排除', '#E6E6FF')):   # 浅蓝色
+            excluded = self.unit_used[unit]
+            if excluded:
+                analysis.append(f"{label}: {self.format_mask(excluded)}")
+                for peer in self.geometry.units[unit]:
+                    if not self.values[peer]:  # 只高亮空格
+                        colors[peer] = color
         
         # 计算最终候选数
-        final_candidates = initial_candidates - row_numbers - col_numbers - box_numbers
+        final_candidates = self.geometry.all_digits & ~self.used_digits(row, col)
         
         # 显示分析结果
         analysis_text = "\n".join(analysis)
         if final_candidates:
-            analysis_text += f"\n可选数字: {sorted(final_candidates)}"
+            analysis_text += f"\n可选数字: {self.format_mask(final_candidates)}"
         else:
             analysis_text += "\n无可用数字!"
         
+        # 高亮显示当前单元格
+        colors[idx] = '#FFFFD0'  # 浅黄色
+        self.paint(enumerate(colors))
+        self.paint(((peer, 'black') for peer in self.geometry.cells), 'fg')
+        
         # 显示候选数标签
         self.show_analysis_popup(row, col, analysis_text)
-        
-        # 高亮显示当前单元格
-        self.cells[(row, col)].configure(bg='#FFFFD0')  # 浅黄色
     
     def show_analysis_popup(self, row, col, text):
         """显示分析弹窗"""
@@ -269,25 +390,21 @@ class SudokuGUI:
         # ESC键关闭弹窗
         popup.bind('<Escape>', lambda e: popup.destroy())
     
+    def highlight_unit(self, unit_cells, color):
+        """高亮显示一个单元中的空格"""
+        self.paint((idx, color) for idx in unit_cells if not self.values[idx])  # 只高亮空格
+
     def highlight_row(self, row, color):
         """高亮显示整行"""
-        for j in range(9):
-            if not self.cells[(row, j)].get():  # 只高亮空格
-                self.cells[(row, j)].configure(bg=color)
+        self.highlight_unit(self.geometry.rows[row], color)
     
     def highlight_column(self, col, color):
         """高亮显示整列"""
-        for i in range(9):
-            if not self.cells[(i, col)].get():  # 只高亮空格
-                self.cells[(i, col)].configure(bg=color)
+        self.highlight_unit(self.geometry.cols[col], color)
     
     def highlight_box(self, row, col, color):
-        """高亮显示3x3宫格"""
-        box_row, box_col = 3 * (row // 3), 3 * (col // 3)
-        for i in range(box_row, box_row + 3):
-            for j in range(box_col, box_col + 3):
-                if not self.cells[(i, j)].get():  # 只高亮空格
-                    self.cells[(i, j)].configure(bg=color)
+        """高亮显示所在的宫格"""
+        self.highlight_unit(self.geometry.boxes[self.geometry.box_of[row * self.size + col]], color)
     
     def on_escape(self, event):
         """处理ESC键事件"""
@@ -299,45 +416,28 @@ class SudokuGUI:
 
     def highlight_number(self, number):
         """高亮显示与选中数字相关的单元格"""
-        self.clear_highlights()  # 先清除现有的高亮
+        self.selected_number = None
         number = int(number)
-        board = self.get_board()
+        bit = digit_bit(number)
+        unit_used = self.unit_used
         
-        # 获取所有可能位置的信息
-        for i in range(9):
-            for j in range(9):
-                cell = self.cells[(i, j)]
-                current_value = board[i][j]
-                
-                if current_value == number:
-                    # 相同数字显示黄色
-                    cell.configure(bg='#FFE066')  # 黄色
-                elif current_value != 0:
-                    # 其他数字显示灰色
-                    cell.configure(bg='#E0E0E0')  # 灰色
+        # 计算每个格子的颜色后一次性重绘，只有颜色变化的格子会被重新配置
+        colors = []
+        for idx, current_value in enumerate(self.values):
+            if current_value == number:
+                # 相同数字显示黄色
+                colors.append('#FFE066')  # 黄色
+            elif current_value != 0:
+                # 其他数字显示灰色
+                colors.append('#E0E0E0')  # 灰色
+            else:
+                # 同行、同列、同宫都没有该数字时可以放置
+                row_unit, col_unit, box_unit = self.geometry.cell_units[idx]
+                if (unit_used[row_unit] | unit_used[col_unit] | unit_used[box_unit]) & bit:
+                    # 不能放置显示红色
+                    colors.append('#FFB6C1')  # 浅红色
                 else:
-                    # 检查是否可以放置该数字
-                    if self.can_place_number(board, i, j, number):
-                        # 可以放置显示绿色
-                        cell.configure(bg='#98FB98')  # 浅绿色
-                    else:
-                        # 不能放置显示红色
-                        cell.configure(bg='#FFB6C1')  # 浅红色
-
-    def can_place_number(self, board, row, col, number):
-        """检查在指定位置是否可以放置数字"""
-        # 检查行
-        if number in board[row]:
-            return False
-            
-        # 检查列
-        if number in [board[i][col] for i in range(9)]:
-            return False
-            
-        # 检查3x3宫格
-        box_row, box_col = 3 * (row // 3), 3 * (col // 3)
-        for i in range(box_row, box_row + 3):
-            for j in range(box_col, box_col + 3):
-                if board[i][j] == number:
-                    return False
-        return True 
\ No newline at end of file
+                    # 可以放置显示绿色
+                    colors.append('#98FB98')  # 浅绿色
+        self.paint(enumerate(colors))
+        self.paint(((idx, 'black') for idx in self.geometry.cells), 'fg')
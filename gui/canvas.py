@@ -0,0 +1,160 @@
+import tkinter as tk
+
+from gui.board import SudokuGUI, pencil_text
+
+CELL_SIZE = 50  # 9x9及以下盘面每个格子的边长（像素）
+LARGE_CELL_SIZE = 32  # 16x16和25x25盘面每个格子的边长
+MARGIN = 4  # 盘面四周的留白
+
+# 方向键对应的行、列偏移
+MOVES = {'Left': (0, -1), 'Right': (0, 1), 'Up': (-1, 0), 'Down': (1, 0)}
+
+
+class CanvasSudokuGUI(SudokuGUI):
+    """用单个 Canvas 绘制的数独面板
+
+    网格、数字、候选数和高亮都是画布上的图形项，整个盘面只有一个控件，
+    键盘输入由画布统一处理。接口与 SudokuGUI 相同，可以直接替换；
+    重绘时只修改内容或颜色有变化的图形项。
+    """
+
+    def cell_origin(self, idx):
+        """格子左上角在画布上的坐标"""
+        row, col = self.geometry.positions[idx]
+        return MARGIN + col * self.cell_size, MARGIN + row * self.cell_size
+
+    def create_board(self):
+        """创建画布并绘制全部格子"""
+        box = self.geometry.box
+        cell_size = self.cell_size = CELL_SIZE if box <= 3 else LARGE_CELL_SIZE
+        size = cell_size * self.size + MARGIN * 2
+        self.canvas = tk.Canvas(self.master, width=size, height=size, bg='white',
+                                highlightthickness=0, takefocus=True)
+        self.canvas.pack(padx=10, pady=10)
+
+        # 每个格子的背景矩形、数字和候选数小字，按格子序号保存图形项编号
+        self.rects = []
+        self.texts = []
+        self.marks = []
+        font = ('Arial', 18 if box <= 3 else 12)
+        pencil_font = ('Courier', 7 if box <= 4 else 5)
+        for idx in self.geometry.cells:
+            x, y = self.cell_origin(idx)
+            center_x, center_y = x + cell_size // 2, y + cell_size // 2
+            self.rects.append(self.canvas.create_rectangle(
+                x, y, x + cell_size, y + cell_size, fill=self.base_colors[idx], outline='#A0A0A0', tags='cell'))
+            self.texts.append(self.canvas.create_text(
+                center_x, center_y, text='', fill='black', font=font, tags='digit'))
+            self.marks.append(self.canvas.create_text(
+                center_x, center_y, text='', fill='#606060', font=pencil_font, tags='pencil'))
+
+        # 宫格之间的粗线
+        for i in range(0, self.size + 1, box):
+            offset = MARGIN + i * cell_size
+            self.canvas.create_line(offset, MARGIN, offset, size - MARGIN, width=3, tags='grid')
+            self.canvas.create_line(MARGIN, offset, size - MARGIN, offset, width=3, tags='grid')
+
+        # 当前选中格子的边框
+        self.cursor = 0
+        x, y = self.cell_origin(0)
+        self.canvas.create_rectangle(x + 2, y + 2, x + cell_size - 2, y + cell_size - 2,
+                                     outline='#0078D7', width=2, state=tk.HIDDEN, tags='cursor')
+
+        self.canvas.bind('<Button-1>', self.on_canvas_click)
+        self.canvas.bind('<Key>', self.on_key)
+
+    def configure_cell_styles(self):
+        """样式在创建图形项时已经设置"""
+
+    def paint(self, colors, option='bg'):
+        """按 (格子序号, 颜色) 设置格子颜色，只重新配置颜色有变化的图形项"""
+        painted = self.painted[option]
+        items = self.rects if option == 'bg' else self.texts
+        for idx, color in colors:
+            if painted[idx] != color:
+                painted[idx] = color
+                self.canvas.itemconfigure(items[idx], fill=color)
+
+    def set_value(self, idx, value):
+        """更新盘面模型，并在数字变化时更新对应的文字项"""
+        if not super().set_value(idx, value):
+            return False
+        self.canvas.itemconfigure(self.texts[idx], text=self.geometry.digit_chars[value - 1] if value else '')
+        # 填了数字的格子不显示候选数
+        self.canvas.itemconfigure(self.marks[idx], state=tk.HIDDEN if value else tk.NORMAL)
+        return True
+
+    def draw_pencil_mark(self, idx, mask):
+        self.canvas.itemconfigure(self.marks[idx], text=pencil_text(mask, self.geometry) if mask else '')
+
+    def clear_board(self):
+        # 清空所有单元格
+        for idx in self.geometry.cells:
+            self.set_value(idx, 0)
+
+    def set_cell(self, i, j, value, highlight=False):
+        """设置单元格的值，可选择是否高亮显示"""
+        self.set_value(i * self.size + j, value)
+        if value != 0:
+            self.paint(((i * self.size + j, 'red' if highlight else 'black'),), 'fg')
+
+            # 如果当前有选中的数字，更新高亮显示
+            if self.selected_number:
+                self.highlight_number(self.selected_number)
+
+    def move_cursor(self, idx):
+        """把选中边框移动到指定格子"""
+        dx, dy = (a - b for a, b in zip(self.cell_origin(idx), self.cell_origin(self.cursor)))
+        self.cursor = idx
+        self.canvas.move('cursor', dx, dy)
+        self.canvas.itemconfigure('cursor', state=tk.NORMAL)
+
+    def on_canvas_click(self, event):
+        """根据点击位置找到格子，交给 on_cell_click 处理"""
+        col = (event.x - MARGIN) // self.cell_size
+        row = (event.y - MARGIN) // self.cell_size
+        if not (0 <= row < self.size and 0 <= col < self.size):
+            return
+        self.canvas.focus_set()
+        self.move_cursor(row * self.size + col)
+        self.on_cell_click(event, row, col)
+
+    def on_key(self, event):
+        """键盘输入：数字或字母填数，退格/删除/0清空，方向键移动选中格子"""
+        idx = self.cursor
+        n = self.size
+        if event.char and event.char.upper() in self.geometry.digit_chars:
+            self.set_cell(*self.geometry.positions[idx], self.geometry.digit_value(event.char))
+        elif event.keysym in ('BackSpace', 'Delete', '0'):
+            self.set_value(idx, 0)
+        elif event.keysym in MOVES:
+            row, col = self.geometry.positions[idx]
+            drow, dcol = MOVES[event.keysym]
+            self.move_cursor((row + drow) % n * n + (col + dcol) % n)
+        else:
+            return None
+        return 'break'
+
+    def show_analysis_popup(self, row, col, text):
+        """显示分析弹窗"""
+        popup = tk.Toplevel(self.master)
+        popup.title(f"位置({row+1},{col+1})的候选数分析")
+
+        # 设置弹窗位置
+        x, y = self.cell_origin(row * self.size + col)
+        popup.geometry(f"+{self.canvas.winfo_rootx() + x + 50}+{self.canvas.winfo_rooty() + y + 50}")
+
+        # 添加分析文本
+        label = tk.Label(
+            popup,
+            text=text,
+            justify='left',
+            font=('Arial', 10),
+            padx=10,
+            pady=10
+        )
+        label.pack()
+
+        # 点击任意位置或按ESC键关闭弹窗
+        popup.bind('<Button-1>', lambda e: popup.destroy())
+        popup.bind('<Escape>', lambda e: popup.destroy())
@@ -1,11 +1,21 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from gui.board import SudokuGUI
+from gui.canvas import CanvasSudokuGUI
 from solver.board import SudokuBoard
-import csv
+from solver.history import SolveHistory
+from solver.importer import iter_puzzles
+from solver.units import geometry_for_cells
+import queue
+import sys
+import threading
+
+# 界面从求解线程的队列中取步骤的间隔（毫秒）和每次最多显示的步骤数
+POLL_INTERVAL = 30
+STEPS_PER_FRAME = 20
 
 class SudokuApp:
-    def __init__(self):
+    def __init__(self, gui_class=SudokuGUI, box=3):
         self.root = tk.Tk()
         self.root.title("数独求解器")
         
@@ -17,8 +27,11 @@ class SudokuApp:
         left_frame = tk.Frame(main_frame)
         left_frame.pack(side=tk.LEFT, padx=10)
         
-        # 创建数独界面
-        self.gui = SudokuGUI(left_frame)
+        # 创建数独界面，导入不同尺寸的题目时在同一个框架中重建
+        self.gui_class = gui_class
+        self.board_frame = tk.Frame(left_frame)
+        self.board_frame.pack()
+        self.gui = gui_class(self.board_frame, box)
         
         # 创建控制按钮
         self.create_controls(left_frame)
@@ -32,23 +45,62 @@ class SudokuApp:
         
         self.solver = None
         self.step_counter = 0  # 添加步骤计数器
+        # 求解过程的快照历史，用于后退和跳转到任意步骤
+        self.history = None
+
+        # 后台求解线程、传回步骤的队列和取消标志
+        self.solve_thread = None
+        self.step_queue = None
+        self.cancel_event = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # 导入文件的题目来源、已读取的题目、当前题目序号和跳过的错误记录
+        self.puzzle_source = None
+        self.puzzle_history = []
+        self.puzzle_index = -1
+        self.import_errors = []
+        # 正在进行的解的个数检查的结果队列
+        self.validity_queue = None
         
     def create_controls(self, parent):
         control_frame = tk.Frame(parent)
         control_frame.pack(pady=10)
         
         # 添加导入按钮
-        import_button = tk.Button(control_frame, text="导入CSV", command=self.import_csv)
+        import_button = tk.Button(control_frame, text="导入", command=self.import_csv)
         import_button.pack(side=tk.LEFT, padx=5)
         
-        solve_button = tk.Button(control_frame, text="求解", command=self.solve)
-        solve_button.pack(side=tk.LEFT, padx=5)
+        self.solve_button = tk.Button(control_frame, text="求解", command=self.solve)
+        self.solve_button.pack(side=tk.LEFT, padx=5)
+
+        self.cancel_button = tk.Button(control_frame, text="取消", command=self.cancel_solve, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
         
         clear_button = tk.Button(control_frame, text="清空", command=self.clear)
         clear_button.pack(side=tk.LEFT, padx=5)
         
-        step_button = tk.Button(control_frame, text="下一步", command=self.next_step)
-        step_button.pack(side=tk.LEFT, padx=5)
+        self.back_button = tk.Button(control_frame, text="上一步", command=self.previous_step)
+        self.back_button.pack(side=tk.LEFT, padx=5)
+
+        self.step_button = tk.Button(control_frame, text="下一步", command=self.next_step)
+        self.step_button.pack(side=tk.LEFT, padx=5)
+
+        # 浏览导入文件中的多个题目
+        browse_frame = tk.Frame(parent)
+        browse_frame.pack(pady=5)
+        tk.Button(browse_frame, text="上一题", command=self.previous_puzzle).pack(side=tk.LEFT, padx=5)
+        self.browse_label = tk.Label(browse_frame, text="", width=24)
+        self.browse_label.pack(side=tk.LEFT, padx=5)
+        tk.Button(browse_frame, text="下一题", command=self.next_puzzle).pack(side=tk.LEFT, padx=5)
+
+        # 导入题目后显示解的个数检查结果
+        self.validity_label = tk.Label(parent, text="", font=('Arial', 10, 'bold'))
+        self.validity_label.pack()
+
+        # 在所有空格中实时显示候选数，填数或清除时只重算受影响的格子
+        self.pencil_var = tk.BooleanVar(self.root, value=False)
+        tk.Checkbutton(parent, text="显示候选数", variable=self.pencil_var,
+                       command=lambda: self.gui.set_live_pencil_marks(self.pencil_var.get())).pack()
     
     def create_step_display(self, parent):
         """创建步骤显示面板"""
@@ -62,6 +114,8 @@ class SudokuApp:
         # 配置标签样式
         self.step_text.tag_configure('method', font=('Arial', 10, 'bold'), foreground='blue')
         self.step_text.tag_configure('detail', font=('Arial', 10))
+        # 盘面当前所在的步骤，点击任一步骤跳转到该步骤之后的盘面
+        self.step_text.tag_configure('current', background='#FFF3B0')
         
         # 添加滚动条
         scrollbar = tk.Scrollbar(parent, command=self.step_text.yview)
@@ -71,10 +125,28 @@ class SudokuApp:
         # 清除步骤按钮
         clear_steps_button = tk.Button(parent, text="清除步骤", command=self.clear_steps)
         clear_steps_button.pack(pady=5)
+
+        # 各解题方法的调用次数、命中次数、扫描格子数和耗时
+        tk.Label(parent, text="方法统计", font=('Arial', 12, 'bold')).pack(pady=5)
+        self.stats_text = tk.Text(parent, width=40, height=16, font=('Courier', 9), state=tk.DISABLED)
+        self.stats_text.pack(fill=tk.X)
+
+    def update_stats(self):
+        """刷新方法统计面板"""
+        self.stats_text.config(state=tk.NORMAL)
+        self.stats_text.delete(1.0, tk.END)
+        if self.solver is not None:
+            self.stats_text.insert(tk.END, '\n'.join(self.solver.stats.lines()))
+        self.stats_text.config(state=tk.DISABLED)
     
-    def add_step(self, step_info):
-        """添加一个解题步骤到显示面板"""
+    def add_step(self, step_info, index=None):
+        """添加一个解题步骤到显示面板，index 为该步骤在快照历史中的序号，点击时跳转到该步骤"""
         self.step_counter += 1  # 增加步骤计数
+        tags = ()
+        if index is not None:
+            tags = (f'step{index}',)
+            self.step_text.tag_bind(tags[0], '<Button-1>', lambda event: self.goto_step(index))
+        start = self.step_text.index('end-1c')
         
         # 插入步骤编号
         self.step_text.insert(tk.END, f"\n步骤 {self.step_counter}:\n", 'method')
@@ -84,7 +156,16 @@ class SudokuApp:
             'single_candidate': '唯一候选数法',
             'single_position': '唯一位置法',
             'naked_pairs': '显性数对法',
-            'block_line_reduction': '区块摒除法'
+            'naked_triples': '显性三数组法',
+            'naked_quads': '显性四数组法',
+            'hidden_pairs': '隐性数对法',
+            'hidden_triples': '隐性三数组法',
+            'hidden_quads': '隐性四数组法',
+            'block_line_reduction': '区块摒除法',
+            'x_wing': 'X翼法',
+            'swordfish': '剑鱼法',
+            'jellyfish': '水母法',
+            'search': '回溯搜索'
         }.get(step_info['type'], '未知方法')
         
         self.step_text.insert(tk.END, f"使用方法：{method_name}\n", 'method')
@@ -96,135 +177,320 @@ class SudokuApp:
         if 'reason' in step_info:
             self.step_text.insert(tk.END, f"推理依据：{step_info['reason']}\n", 'detail')
         
+        for tag in tags:
+            self.step_text.tag_add(tag, start, 'end-1c')
         self.step_text.see(tk.END)  # 自动滚动到最新步骤
     
+    def show_step(self, step, index=None):
+        """把一个解题步骤填入的数字显示到界面并记录到步骤面板"""
+        for row, col, value in step.placements():
+            self.gui.set_cell(row, col, value, highlight=True)
+        self.add_step(step, index)
+        if index is not None:
+            self.mark_current_step(index)
+
+    def mark_current_step(self, index):
+        """在步骤面板中标出盘面当前所在的步骤"""
+        self.step_text.tag_remove('current', 1.0, tk.END)
+        ranges = self.step_text.tag_ranges(f'step{index}')
+        if ranges:
+            self.step_text.tag_add('current', *ranges)
+            self.step_text.see(ranges[0])
+
+    def show_snapshot(self):
+        """把界面同步到快照历史的当前位置，只重设数字有变化的格子，并高亮当前步骤填入的数字"""
+        self.gui.clear_highlights()
+        board = self.solver.board
+        for idx, value in enumerate(self.gui.values):
+            row, col = divmod(idx, self.gui.size)
+            if value != board[row][col]:
+                self.gui.set_cell(row, col, board[row][col])
+        step = self.history.steps[self.history.position]
+        if step is not None:
+            for row, col, value in step.placements():
+                self.gui.set_cell(row, col, value, highlight=True)
+        self.mark_current_step(self.history.position)
+
+    def goto_step(self, index):
+        """跳转到第 index 步之后的盘面，不重新求解"""
+        if self.is_solving() or self.history is None or not 0 <= index <= self.history.last:
+            return
+        self.history.goto(index)
+        self.show_snapshot()
+
+    def previous_step(self):
+        """回到上一步之前的盘面"""
+        if self.history is not None and self.history.position > 0:
+            self.goto_step(self.history.position - 1)
+
     def clear_steps(self):
         """清除所有步骤"""
         self.step_text.delete(1.0, tk.END)
         self.step_counter = 0  # 重置步骤计数器
     
     def import_csv(self):
-        """导入CSV文件"""
+        """导入题目文件，支持 CSV、每行一个题目和 packed 二进制格式，文件中有多个题目时可以逐题浏览
+
+        CSV 和每行一个题目的格式可以是4x4、9x9、16x16或25x25的题目，界面按题目尺寸重建盘面。
+        """
         file_path = filedialog.askopenfilename(
-            title="选择CSV文件",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            title="选择题目文件",
+            filetypes=[("CSV files", "*.csv"), ("Text files", "*.txt"),
+                       ("Packed files", "*.bin *.sdk"), ("Puzzle stores", "*.sdb"), ("All files", "*.*")]
         )
         
         if not file_path:
             return
-            
+
+        self.close_puzzle_source()
+        self.import_errors = []
+        # 题目按需从文件中读取，已浏览过的题目保存在列表中以便返回上一题
+        self.puzzle_source = iter_puzzles(file_path, on_error=self.import_errors.append)
+        self.puzzle_history = []
+        self.puzzle_index = -1
+        if not self.show_puzzle(0):
+            self.close_puzzle_source()
+            detail = f"\n{self.import_errors[0]}" if self.import_errors else ""
+            messagebox.showerror("错误", f"文件中没有可用的题目{detail}")
+
+    def show_puzzle(self, index):
+        """显示已导入文件中的第 index 个题目，需要时从文件中继续读取，题目不存在时返回 False"""
+        try:
+            while index >= len(self.puzzle_history) and self.puzzle_source is not None:
+                puzzle = next(self.puzzle_source, None)
+                if puzzle is None:
+                    self.close_puzzle_source()
+                    break
+                self.puzzle_history.append(puzzle)
+        except OSError as e:
+            self.close_puzzle_source()
+            messagebox.showerror("错误", f"读取题目文件时出错：{str(e)}")
+        if not 0 <= index < len(self.puzzle_history):
+            return False
+
+        # 清空当前数独板并填入新数据，题目尺寸不同时重建盘面
+        self.clear()
+        self.puzzle_index = index
+        puzzle = self.puzzle_history[index]
+        geometry = geometry_for_cells(len(puzzle))
+        if geometry is not self.gui.geometry:
+            self.rebuild_board(geometry.box)
+        for idx, char in enumerate(puzzle):
+            if char != '.':
+                self.gui.set_cell(*geometry.positions[idx], geometry.digit_value(char))
+        self.update_browse_status()
+        self.update_validity()
+        return True
+
+    def rebuild_board(self, box):
+        """按宫格边长 box 重新创建数独界面，保留实时候选数的设置"""
+        self.gui.set_live_pencil_marks(False)
+        for widget in self.board_frame.winfo_children():
+            widget.destroy()
+        self.gui = self.gui_class(self.board_frame, box)
+        if self.pencil_var.get():
+            self.gui.set_live_pencil_marks(True)
+
+    def update_validity(self):
+        """在后台线程中检查当前盘面有无解、唯一解还是多解，完成后显示在检查结果标签中
+
+        大于9x9的稀疏盘面计数可能要搜索很久，而且线程无法中途停止，因此只检查9x9的盘面。
+        """
+        if self.gui.size > 9:
+            self.validity_queue = None
+            self.validity_label.config(text="检查结果：大于9x9的盘面不检查", fg='gray')
+            return
+        self.validity_queue = queue.Queue()
+        self.validity_label.config(text="检查结果：检查中……", fg='gray')
+        threading.Thread(target=self.validity_worker, args=(self.gui.get_board(), self.validity_queue),
+                         daemon=True).start()
+        self.root.after(POLL_INTERVAL, self.show_validity, self.validity_queue)
+
+    @staticmethod
+    def validity_worker(board, result_queue):
+        """检查线程：计算解的个数（最多数到2），数字冲突时为 None"""
+        checker = SudokuBoard(board, trace=False)
+        result_queue.put(None if checker.has_conflicts() else checker.count_solutions(2))
+
+    def show_validity(self, result_queue):
+        """检查完成后显示结果，未完成时在下一帧继续等待"""
+        if result_queue is not self.validity_queue:
+            # 盘面已被清空或换成了其他题目
+            return
         try:
-            # 尝试不同的编码方式
-            encodings = ['utf-8-sig', 'utf-8', 'gbk']
-            for encoding in encodings:
-                try:
-                    with open(file_path, 'r', encoding=encoding) as file:
-                        reader = csv.reader(file)
-                        board = []
-                        for row in reader:
-                            # 转换每一行的数据，空值转为0
-                            number_row = []
-                            for cell in row:
-                                # 移除所有不可见字符
-                                cell = ''.join(c for c in cell if c.isprintable()).strip()
-                                if cell == '':
-                                    number_row.append(0)
-                                else:
-                                    try:
-                                        num = int(cell)
-                                        # 允许0-9的数字
-                                        if 0 <= num <= 9:
-                                            number_row.append(num)
-                                        else:
-                                            messagebox.showerror("错误", f"数值必须在1-9之间: {cell}")
-                                            return
-                                    except ValueError:
-                                        # 跳过无效的数值，视为空格
-                                        number_row.append(0)
-                        
-                            # 确保每行都有9个数字，不足的补0
-                            while len(number_row) < 9:
-                                number_row.append(0)
-                            # 如果超过9个数字，只取前9个
-                            number_row = number_row[:9]
-                            board.append(number_row)
-                        
-                        # 确保有9行数据，不足的补充空行
-                        while len(board) < 9:
-                            board.append([0] * 9)
-                        # 如果超过9行，只取前9行
-                        board = board[:9]
-                        
-                        # 清空当前数独板并填入新数据
-                        self.clear()
-                        for i in range(9):
-                            for j in range(9):
-                                if board[i][j] != 0:
-                                    self.gui.set_cell(i, j, board[i][j])
-                        
-                        # 如果成功读取，就跳出循环
-                        break
-                except UnicodeDecodeError:
-                    # 如果是最后一种编码方式还失败，则报错
-                    if encoding == encodings[-1]:
-                        raise
-                    continue
-                    
-        except Exception as e:
-            messagebox.showerror("错误", f"导入CSV文件时出错：{str(e)}")
+            count = result_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(POLL_INTERVAL, self.show_validity, result_queue)
+            return
+        self.validity_queue = None
+        text, color = {
+            None: ("数字冲突", 'red'),
+            0: ("无解", 'red'),
+            1: ("唯一解", 'green'),
+            2: ("多解", 'orange'),
+        }[count]
+        self.validity_label.config(text=f"检查结果：{text}", fg=color)
+
+    def previous_puzzle(self):
+        if self.puzzle_index > 0:
+            self.show_puzzle(self.puzzle_index - 1)
+
+    def next_puzzle(self):
+        if self.puzzle_index >= 0 and not self.show_puzzle(self.puzzle_index + 1):
+            self.update_browse_status()
+
+    def close_puzzle_source(self):
+        """关闭正在读取的题目文件"""
+        if self.puzzle_source is not None:
+            self.puzzle_source.close()
+            self.puzzle_source = None
+
+    def update_browse_status(self):
+        """刷新当前题目序号和跳过的错误记录数"""
+        if self.puzzle_index < 0:
+            self.browse_label.config(text="")
+            return
+        total = "" if self.puzzle_source is not None else f"/{len(self.puzzle_history)}"
+        status = f"第{self.puzzle_index + 1}{total}题"
+        if self.import_errors:
+            status += f"（跳过{len(self.import_errors)}条错误记录）"
+        self.browse_label.config(text=status)
     
     def solve(self):
-        """完整求解数独"""
+        """在后台线程中完整求解数独，界面通过队列逐批显示步骤"""
+        if self.is_solving():
+            return
         board = self.gui.get_board()
-        self.solver = SudokuBoard(board)
-        self.clear_steps()
-        
-        step_count = 1
-        # 不断执行单步求解直到完成
-        while not self.solver.is_solved():
-            self.gui.clear_highlights()  # 清除之前的高亮
-            if not self.solver.solve_step():
-                self.add_step({
-                    'type': 'error',
-                    'description': '无法找到下一步解法！'
-                })
-                tk.messagebox.showinfo("提示", "当前无法找到下一步解法！")
+        if self.history is not None and board == self.solver.board:
+            # 盘面没有被修改过：从已记录的最后一步继续，之前的步骤直接重放
+            self.goto_step(self.history.last)
+        else:
+            self.solver = SudokuBoard(board, stats=True)
+            self.history = SolveHistory(self.solver)
+            self.clear_steps()
+        self.gui.clear_highlights()
+
+        self.step_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.solve_thread = threading.Thread(
+            target=self.solve_worker,
+            args=(self.solver, self.history, self.step_queue, self.cancel_event),
+            daemon=True,
+        )
+        self.set_solving(True)
+        self.solve_thread.start()
+        self.root.after(POLL_INTERVAL, self.drain_steps, self.step_queue)
+
+    @staticmethod
+    def solve_worker(solver, history, step_queue, cancel_event):
+        """求解线程：不接触任何界面控件，只记录快照并把步骤放入队列
+
+        队列中的元素为 ('step', (快照序号, 步骤)) 或结束标记 ('done'/'unsolvable'/'cancelled', None)。
+        """
+        while not solver.is_solved():
+            if cancel_event.is_set():
+                step_queue.put(('cancelled', None))
+                return
+            # 逻辑方法无法继续时回退到回溯搜索
+            if not solver.solve_step() and not solver.solve_search():
+                step_queue.put(('unsolvable', None))
+                return
+            history.record(solver.solution_steps)
+            first = history.last - len(solver.solution_steps) + 1
+            for index, step in enumerate(solver.solution_steps, first):
+                step_queue.put(('step', (index, step)))
+            solver.solution_steps.clear()
+        step_queue.put(('done', None))
+
+    def drain_steps(self, step_queue):
+        """从队列取出一批步骤显示到界面，未结束时在下一帧继续"""
+        if step_queue is not self.step_queue:
+            # 求解已被清空或重新开始
+            return
+        highlighted = False
+        for _ in range(STEPS_PER_FRAME):
+            try:
+                kind, step = step_queue.get_nowait()
+            except queue.Empty:
                 break
-            
-            # 更新界面
-            for step in self.solver.solution_steps:
-                pos = step['position']
-                value = step['value']
-                self.gui.set_cell(pos[0], pos[1], value, highlight=True)
-                self.add_step(step)
-                
-            self.solver.solution_steps.clear()
-    
+            if kind != 'step':
+                self.finish_solve(kind)
+                return
+            if not highlighted:
+                self.gui.clear_highlights()  # 清除之前一批的高亮
+                highlighted = True
+            index, step = step
+            self.show_step(step, index)
+        self.root.after(POLL_INTERVAL, self.drain_steps, step_queue)
+
+    def finish_solve(self, result):
+        """求解线程结束后恢复按钮并显示结果"""
+        self.solve_thread = None
+        self.step_queue = None
+        self.set_solving(False)
+        self.update_stats()
+        if result == 'unsolvable':
+            self.add_step({
+                'type': 'error',
+                'description': '该数独无解！'
+            })
+            tk.messagebox.showinfo("提示", "该数独无解！")
+        elif result == 'cancelled':
+            self.add_step({
+                'type': 'error',
+                'description': '求解已取消'
+            })
+            # 盘面停留在取消时的状态，继续时从头重新求解
+            self.solver = None
+            self.history = None
+
+    def cancel_solve(self):
+        """请求求解线程在当前步骤完成后停止"""
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+
+    def is_solving(self):
+        return self.solve_thread is not None
+
+    def set_solving(self, solving):
+        """求解期间只允许取消"""
+        state = tk.DISABLED if solving else tk.NORMAL
+        self.solve_button.config(state=state)
+        self.back_button.config(state=state)
+        self.step_button.config(state=state)
+        self.cancel_button.config(state=tk.NORMAL if solving else tk.DISABLED)
+
     def next_step(self):
         """执行单步求解"""
+        if self.is_solving():
+            return
         if self.solver is None:
             board = self.gui.get_board()
-            self.solver = SudokuBoard(board)
+            self.solver = SudokuBoard(board, stats=True)
+            self.history = SolveHistory(self.solver)
             self.clear_steps()
+
+        if not self.history.at_end():
+            # 后退过：重新应用已记录的下一步，不重新求解
+            self.goto_step(self.history.position + 1)
+            return
         
         self.gui.clear_highlights()  # 清除之前的高亮
         
         if not self.solver.is_solved():
-            if self.solver.solve_step():
+            if self.solver.solve_step() or self.solver.solve_search():
                 # 更新界面显示最后一步的结果
-                step = self.solver.solution_steps[-1]
-                pos = step['position']
-                value = step['value']
-                self.gui.set_cell(pos[0], pos[1], value, highlight=True)
-                self.add_step(step)
+                self.history.record(self.solver.solution_steps)
+                self.show_step(self.solver.solution_steps[-1], self.history.last)
                 
                 self.solver.solution_steps.clear()
+                self.update_stats()
             else:
                 self.add_step({
                     'type': 'error',
-                    'description': '无法找到下一步解法！'
+                    'description': '该数独无解！'
                 })
-                tk.messagebox.showinfo("提示", "当前无法找到下一步解法！")
+                tk.messagebox.showinfo("提示", "该数独无解！")
         else:
             self.add_step({
                 'type': 'complete',
@@ -233,13 +499,31 @@ class SudokuApp:
             tk.messagebox.showinfo("提示", "数独已解决！")
     
     def clear(self):
+        if self.is_solving():
+            # 丢弃尚未显示的步骤，线程会在当前步骤完成后退出
+            self.cancel_solve()
+            self.solve_thread = None
+            self.step_queue = None
+            self.set_solving(False)
         self.gui.clear_board()
         self.clear_steps()
         self.solver = None
+        self.history = None
+        self.update_stats()
+        self.validity_queue = None
+        self.validity_label.config(text="")
     
+    def on_close(self):
+        self.cancel_solve()
+        self.close_puzzle_source()
+        self.root.destroy()
+
     def run(self):
         self.root.mainloop()
 
 if __name__ == "__main__":
-    app = SudokuApp()
+    # --canvas 使用单个画布绘制的盘面，启动和重绘更快；--size 16 以空白的16x16盘面启动（4、9、16、25）
+    args = sys.argv[1:]
+    size = int(args[args.index('--size') + 1]) if '--size' in args[:-1] else 9
+    app = SudokuApp(CanvasSudokuGUI if '--canvas' in args else SudokuGUI, geometry_for_cells(size * size).box)
     app.run() 
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""基于NumPy的批量候选数计算
+
+所有函数都以形状为 (N, 9, 9) 的 uint8 数组表示N个盘面，0表示空格，
+在所有盘面上同时做向量化运算，适合对大量题目做预处理和校验。
+候选数掩码与 solver.board 相同：数字n对应第(n-1)位。
+"""
+import numpy as np
+
+ALL_DIGITS = 0x1FF
+# 数字到掩码位的查找表，0对应空格
+DIGIT_BIT = np.array([0] + [1 << i for i in range(9)], dtype=np.uint16)
+DIGIT_BITS = DIGIT_BIT[1:]
+# 每个9位掩码的置位个数，以及最低位对应的数字
+POPCOUNT = np.array([bin(mask).count('1') for mask in range(512)], dtype=np.uint8)
+LOWEST_DIGIT = np.array([(mask & -mask).bit_length() for mask in range(512)], dtype=np.uint8)
+
+# propagate 返回的盘面状态
+STALLED = 0
+SOLVED = 1
+INVALID = -1
+
+
+def from_strings(lines):
+    """把81个字符一行的题目转换为 (N, 9, 9) 数组，'.'或'0'表示空格"""
+    text = ''.join(line.strip() for line in lines).replace('.', '0')
+    data = np.frombuffer(text.encode('ascii'), dtype=np.uint8) - ord('0')
+    if data.size % 81 or (data > 9).any():
+        raise ValueError('题目必须由81个数字或"."组成')
+    return data.reshape(-1, 9, 9)
+
+
+def to_strings(boards):
+    """把 (N, 9, 9) 数组转换为81个字符的字符串列表，空格用'.'表示"""
+    chars = np.where(boards == 0, ord('.'), boards + ord('0')).astype(np.uint8)
+    return [row.tobytes().decode('ascii') for row in chars.reshape(-1, 81)]
+
+
+def _box_reduce(values, reduce):
+    """按宫格归约 (N, 9, 9, ...) 数组，返回形状 (N, 3, 3, ...)"""
+    n = values.shape[0]
+    boxes = values.reshape((n, 3, 3, 3, 3) + values.shape[3:])
+    return reduce(reduce(boxes, axis=4), axis=2)
+
+
+def _expand_boxes(values):
+    """把 (N, 3, 3, ...) 的宫格数据展开到 (N, 9, 9, ...) 的每个格子"""
+    return values.repeat(3, axis=1).repeat(3, axis=2)
+
+
+def candidate_masks(boards):
+    """计算每个空格的候选数掩码，已填格子为0"""
+    bits = DIGIT_BIT[boards]
+    rows = np.bitwise_or.reduce(bits, axis=2)
+    cols = np.bitwise_or.reduce(bits, axis=1)
+    boxes = _box_reduce(bits, np.bitwise_or.reduce)
+    used = rows[:, :, None] | cols[:, None, :] | _expand_boxes(boxes)
+    return np.where(boards == 0, ~used & ALL_DIGITS, 0).astype(np.uint16)
+
+
+def naked_singles(masks):
+    """唯一候选数法：返回每个格子可以填入的数字，没有则为0"""
+    return np.where(POPCOUNT[masks] == 1, LOWEST_DIGIT[masks], 0).astype(np.uint8)
+
+
+def hidden_singles(masks):
+    """唯一位置法：返回每个格子因在行/列/宫中唯一而可以填入的数字，没有则为0"""
+    # planes[n, row, col, d] 表示数字d+1是否是该格的候选数
+    planes = (masks[..., None] & DIGIT_BITS) != 0
+    row_once = planes.sum(axis=2, dtype=np.uint8) == 1
+    col_once = planes.sum(axis=1, dtype=np.uint8) == 1
+    box_once = _box_reduce(planes.astype(np.uint8), np.add.reduce) == 1
+    hits = planes & (row_once[:, :, None, :] | col_once[:, None, :, :] | _expand_boxes(box_once))
+    return np.where(hits.any(axis=3), hits.argmax(axis=3) + 1, 0).astype(np.uint8)
+
+
+def has_conflicts(boards):
+    """检查每个盘面的行、列、宫中是否有重复数字"""
+    onehot = (boards[..., None] == np.arange(1, 10)).astype(np.uint8)
+    rows = onehot.sum(axis=2) > 1
+    cols = onehot.sum(axis=1) > 1
+    boxes = _box_reduce(onehot, np.add.reduce) > 1
+    return rows.any(axis=(1, 2)) | cols.any(axis=(1, 2)) | boxes.any(axis=(1, 2, 3))
+
+
+def propagate(boards, max_rounds=81):
+    """对所有盘面反复应用唯一候选数法和唯一位置法，直到不再有变化
+
+    返回 (盘面, 候选数掩码, 状态)，状态为 SOLVED、STALLED 或 INVALID。
+    输入数组不会被修改。
+    """
+    boards = np.array(boards, dtype=np.uint8)
+    status = np.full(len(boards), STALLED, dtype=np.int8)
+    active = np.arange(len(boards))
+
+    for _ in range(max_rounds):
+        if not active.size:
+            break
+        current = boards[active]
+        masks = candidate_masks(current)
+        empty = current == 0
+        # 矛盾：空格没有候选数，或同一单元出现重复数字
+        invalid = (empty & (masks == 0)).any(axis=(1, 2)) | has_conflicts(current)
+        complete = ~empty.any(axis=(1, 2))
+        status[active[invalid]] = INVALID
+        status[active[complete & ~invalid]] = SOLVED
+
+        open_boards = ~invalid & ~complete
+        current, masks, active = current[open_boards], masks[open_boards], active[open_boards]
+        placed = naked_singles(masks)
+        placed = np.where(placed > 0, placed, hidden_singles(masks))
+        # 本轮没有任何填数的盘面停止迭代
+        progress = (placed > 0).any(axis=(1, 2))
+        active = active[progress]
+        boards[active] = current[progress] + placed[progress]
+
+    return boards, candidate_masks(boards), status
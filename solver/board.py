@@ -1,249 +1,734 @@
-class SudokuBoard:
-    def __init__(self, board=None):
-        # 初始化9x9的数独板
-        self.board = [[0]*9 for _ in range(9)] if board is None else board
-        # 存储每个格子的候选数
-        self.candidates = {}
-        self.initialize_candidates()
-        # 存储解题步骤
-        self.solution_steps = []
-        
-    def initialize_candidates(self):
-        """初始化每个空格的候选数"""
-        for i in range(9):
-            for j in range(9):
-                if self.board[i][j] == 0:
-                    self.candidates[(i, j)] = self.get_candidates(i, j)
-    
-    def get_candidates(self, row, col):
-        """获取指定位置的所有候选数"""
-        if self.board[row][col] != 0:
-            return set()
-            
-        used_numbers = set()
-        # 检查行
-        used_numbers.update(self.board[row])
-        # 检查列
-        used_numbers.update(self.board[i][col] for i in range(9))
-        # 检查3x3宫格
-        box_row, box_col = 3 * (row // 3), 3 * (col // 3)
-        for i in range(box_row, box_row + 3):
-            for j in range(box_col, box_col + 3):
-                used_numbers.add(self.board[i][j])
-                
-        return set(range(1, 10)) - used_numbers
-    
-    def is_valid(self, row, col, num):
-        """检查在指定位置放置数字是否有效"""
-        # 检查行
-        if num in self.board[row]:
-            return False
-            
-        # 检查列
-        if num in [self.board[i][col] for i in range(9)]:
-            return False
-            
-        # 检查3x3宫格
-        box_row, box_col = 3 * (row // 3), 3 * (col // 3)
-        for i in range(box_row, box_row + 3):
-            for j in range(box_col, box_col + 3):
-                if self.board[i][j] == num:
-                    return False
-        return True
-    
-    def find_empty(self):
-        """找到一个空位置"""
-        for i in range(9):
-            for j in range(9):
-                if self.board[i][j] == 0:
-                    return i, j
-        return None
-    
-    def solve_step(self):
-        """执行一步求解，返回是否找到解决方案"""
-        # 1. 尝试唯一候选数法
-        if self.solve_single_candidate():
-            return True
-            
-        # 2. 尝试唯一位置法
-        if self.solve_single_position():
-            return True
-            
-        # 3. 尝试显性数对法
-        if self.solve_naked_pairs():
-            return True
-            
-        # 4. 尝试区块摒除法
-        if self.solve_block_line_reduction():
-            return True
-            
-        # 如果没有找到简单的解法，返回False
-        return False
-    
-    def solve_single_candidate(self):
-        """唯一候选数法：查找只有一个候选数的格子"""
-        for pos, candidates in self.candidates.items():
-            if len(candidates) == 1:
-                num = candidates.pop()
-                row, col = pos
-                self.board[row][col] = num
-                self.solution_steps.append({
-                    'type': 'single_candidate',
-                    'position': pos,
-                    'value': num,
-                    'description': f'在位置({row+1},{col+1})填入数字{num}',
-                    'reason': f'该位置只有一个候选数{num}，其他数字都被行、列或宫格中的数字排除'
-                })
-                self.update_candidates()
-                return True
-        return False
-    
-    def solve_single_position(self):
-        """唯一位置法：在行/列/宫中查找只出现一次的候选数"""
-        # 检查每一行
-        for row in range(9):
-            for num in range(1, 10):
-                positions = []
-                for col in range(9):
-                    if self.board[row][col] == 0 and num in self.candidates.get((row, col), set()):
-                        positions.append((row, col))
-                if len(positions) == 1:
-                    pos = positions[0]
-                    self.board[pos[0]][pos[1]] = num
-                    self.solution_steps.append({
-                        'type': 'single_position',
-                        'position': pos,
-                        'value': num,
-                        'description': f'在第{row+1}行中，数字{num}只能放在位置({pos[0]+1},{pos[1]+1})'
-                    })
-                    self.update_candidates()
-                    return True
-        
-        # 检查每一列
-        for col in range(9):
-            for num in range(1, 10):
-                positions = []
-                for row in range(9):
-                    if self.board[row][col] == 0 and num in self.candidates.get((row, col), set()):
-                        positions.append((row, col))
-                if len(positions) == 1:
-                    pos = positions[0]
-                    self.board[pos[0]][pos[1]] = num
-                    self.solution_steps.append({
-                        'type': 'single_position',
-                        'position': pos,
-                        'value': num,
-                        'description': f'在第{col+1}列中，数字{num}只能放在位置({pos[0]+1},{pos[1]+1})'
-                    })
-                    self.update_candidates()
-                    return True
-        
-        # 检查每个3x3宫格
-        for box_row in range(3):
-            for box_col in range(3):
-                for num in range(1, 10):
-                    positions = []
-                    for i in range(3):
-                        for j in range(3):
-                            row, col = box_row*3 + i, box_col*3 + j
-                            if self.board[row][col] == 0 and num in self.candidates.get((row, col), set()):
-                                positions.append((row, col))
-                    if len(positions) == 1:
-                        pos = positions[0]
-                        self.board[pos[0]][pos[1]] = num
-                        box_num = box_row * 3 + box_col + 1
-                        self.solution_steps.append({
-                            'type': 'single_position',
-                            'position': pos,
-                            'value': num,
-                            'description': f'在第{box_num}宫格中，数字{num}只能放在位置({pos[0]+1},{pos[1]+1})'
-                        })
-                        self.update_candidates()
-                        return True
-        
-        return False
-    
-    def solve_naked_pairs(self):
-        """显性数对法：找出同一行/列/宫中两个格子具有相同的两个候选数"""
-        # 检查每一行
-        for row in range(9):
-            pairs = {}
-            for col in range(9):
-                if self.board[row][col] == 0:
-                    candidates = self.candidates.get((row, col), set())
-                    if len(candidates) == 2:
-                        candidates = tuple(sorted(candidates))
-                        if candidates in pairs:
-                            # 找到数对，从同一行的其他格子中删除这两个数字
-                            pair_col = pairs[candidates]
-                            removed = False
-                            for other_col in range(9):
-                                if other_col != col and other_col != pair_col and self.board[row][other_col] == 0:
-                                    other_candidates = self.candidates.get((row, other_col), set())
-                                    original_len = len(other_candidates)
-                                    other_candidates -= set(candidates)
-                                    if len(other_candidates) < original_len:
-                                        removed = True
-                                        self.candidates[(row, other_col)] = other_candidates
-                            
-                            if removed:
-                                self.solution_steps.append({
-                                    'type': 'naked_pairs',
-                                    'position': [(row, pair_col), (row, col)],
-                                    'value': list(candidates),
-                                    'description': f'在第{row+1}行找到数对{candidates}，可以从其他格子删除这些数字'
-                                })
-                                return True
-                        else:
-                            pairs[candidates] = col
-        
-        # TODO: 添加列和宫格的检查
-        return False
-    
-    def solve_block_line_reduction(self):
-        """区块摒除法：当某个数字在一个宫格中只能出现在某一行或列时，该数字在此行或列的其他宫格中必须被删除"""
-        for box_row in range(3):
-            for box_col in range(3):
-                for num in range(1, 10):
-                    # 检查数字在当前宫格中可能的位置
-                    positions = []
-                    for i in range(3):
-                        for j in range(3):
-                            row, col = box_row*3 + i, box_col*3 + j
-                            if self.board[row][col] == 0 and num in self.candidates.get((row, col), set()):
-                                positions.append((row, col))
-                    
-                    if positions and all(pos[0] == positions[0][0] for pos in positions):
-                        # 所有位置在同一行
-                        row = positions[0][0]
-                        removed = False
-                        # 检查同一行的其他宫格
-                        for other_box_col in range(3):
-                            if other_box_col != box_col:
-                                for j in range(3):
-                                    col = other_box_col*3 + j
-                                    if self.board[row][col] == 0 and num in self.candidates.get((row, col), set()):
-                                        self.candidates[(row, col)].remove(num)
-                                        removed = True
-                    
-                        if removed:
-                            self.solution_steps.append({
-                                'type': 'block_line_reduction',
-                                'position': positions,
-                                'value': num,
-                                'description': f'数字{num}在第{box_row*3+box_col+1}宫格中只能出现在第{row+1}行，'
-                                            f'因此可以从第{row+1}行的其他宫格中删除该数字'
-                            })
-                            return True
-                    
-                    # TODO: 添加列的检查
-        return False
-    
-    def update_candidates(self):
-        """更新所有空格的候选数"""
-        self.candidates.clear()
-        self.initialize_candidates()
-    
-    def is_solved(self):
-        """检查数独是否已解决"""
-        return all(0 not in row for row in self.board) 
\ No newline at end of file
+from functools import partial
+from itertools import islice
+from time import perf_counter
+
+from solver.dirty import DirtyTracker
+from solver.stats import SolverStats
+from solver.steps import Step
+from solver.units import STANDARD, geometry, geometry_for_cells
+
+# 候选数使用整数掩码表示：数字n对应第(n-1)位，9x9盘面为9位
+ALL_DIGITS = 0x1FF
+
+
+def digit_bit(num):
+    """返回数字对应的掩码位"""
+    return 1 << (num - 1)
+
+
+def mask_to_digits(mask):
+    """把掩码展开为从小到大的数字列表"""
+    digits = []
+    while mask:
+        low = mask & -mask
+        digits.append(low.bit_length())
+        mask ^= low
+    return digits
+
+
+# 数组和鱼形结构的大小对应的步骤类型
+NAKED_SUBSETS = {2: 'naked_pairs', 3: 'naked_triples', 4: 'naked_quads'}
+HIDDEN_SUBSETS = {2: 'hidden_pairs', 3: 'hidden_triples', 4: 'hidden_quads'}
+FISH = {2: 'x_wing', 3: 'swordfish', 4: 'jellyfish'}
+
+# solve_step 依次尝试的解题方法，按从易到难排列：(步骤类型, 方法名, 参数)
+TECHNIQUES = (
+    ('single_candidate', 'solve_single_candidate', ()),
+    ('single_position', 'solve_single_position', ()),
+    ('naked_pairs', 'solve_naked_subset', (2,)),
+    ('block_line_reduction', 'solve_block_line_reduction', ()),
+    ('x_wing', 'solve_fish', (2,)),
+    ('hidden_pairs', 'solve_hidden_subset', (2,)),
+    ('naked_triples', 'solve_naked_subset', (3,)),
+    ('swordfish', 'solve_fish', (3,)),
+    ('hidden_triples', 'solve_hidden_subset', (3,)),
+    ('naked_quads', 'solve_naked_subset', (4,)),
+    ('jellyfish', 'solve_fish', (4,)),
+    ('hidden_quads', 'solve_hidden_subset', (4,)),
+)
+TECHNIQUE_NAMES = tuple(name for name, _, _ in TECHNIQUES)
+
+
+def techniques_up_to(name):
+    """返回从最简单的方法到 name（含）为止的 TECHNIQUES 前缀"""
+    if name not in TECHNIQUE_NAMES:
+        raise ValueError(f'未知的解题方法: {name}')
+    return TECHNIQUES[:TECHNIQUE_NAMES.index(name) + 1]
+
+
+def iter_subsets(masks, size, start=0, chosen=(), union=0):
+    """按字典序产出 size 个掩码的组合中并集恰好有 size 位的组合
+
+    产出 (下标元组, 并集)。并集位数一旦超过 size 就不再继续扩展该组合。
+    """
+    if len(chosen) == size:
+        if union.bit_count() == size:
+            yield chosen, union
+        return
+    for i in range(start, len(masks) - (size - len(chosen)) + 1):
+        merged = union | masks[i]
+        if merged.bit_count() <= size:
+            yield from iter_subsets(masks, size, i + 1, chosen + (i,), merged)
+
+
+class SudokuBoard:
+    def __init__(self, board=None, trace=True, stats=None, box=None):
+        # 盘面尺寸：传入 board 时由行数决定，否则由宫格边长 box 决定，默认为9x9
+        if board is not None:
+            self.geometry = geometry_for_cells(len(board) ** 2)
+        else:
+            self.geometry = geometry(box) if box else STANDARD
+        n = self.size = self.geometry.size
+        # 初始化n x n的数独板
+        self.board = [[0]*n for _ in range(n)] if board is None else board
+        # 每行、每列、每宫已使用数字的掩码
+        self.row_used = [0] * n
+        self.col_used = [0] * n
+        self.box_used = [0] * n
+        # 每个格子的候选数掩码，按 row*n+col 存储，已填格子为0
+        self.masks = [0] * self.geometry.cell_count
+        # 撤销日志：记录每次填数和删除候选数之前的状态
+        self.journal = []
+        # 日志被回退或清空的次数，用于让各方法的脏单元记录失效
+        self.journal_epoch = 0
+        # 各解题方法的脏单元记录
+        self.trackers = {}
+        # 解题方法累计扫描的格子数；stats为True或SolverStats对象时记录各方法的计数和耗时
+        self.scanned = 0
+        self.stats = SolverStats() if stats is True else stats or None
+        self.initialize_candidates()
+        # 存储解题步骤，trace为False时不记录任何步骤
+        self.trace = trace
+        self.solution_steps = []
+
+    @classmethod
+    def from_string(cls, text, **kwargs):
+        """从字符串创建数独板，'.'或'0'表示空格
+
+        长度为16、81、256或625个字符，分别对应4x4、9x9、16x16和25x25的盘面，
+        大于9的数字依次用字母A、B、C……表示（不区分大小写）。
+        """
+        text = text.strip()
+        geometry = geometry_for_cells(len(text))
+        cells = [geometry.digit_value(char) for char in text]
+        n = geometry.size
+        return cls([cells[i:i + n] for i in range(0, len(cells), n)], **kwargs)
+
+    @classmethod
+    def from_view(cls, view, **kwargs):
+        """从题目库（见 solver.store）的一条记录创建数独板，不经过字符串
+
+        view 可以是 memoryview、bytes 或 uint8 的 NumPy 数组：每个格子一个字节（16、81、256或625字节，0为空格），
+        或9x9题目41字节的半字节编码（高4位在前）。
+        """
+        data = memoryview(view).cast('B')
+        if len(data) == (STANDARD.cell_count + 1) // 2:
+            data = bytes(value for byte in data for value in divmod(byte, 16))[:STANDARD.cell_count]
+        geometry = geometry_for_cells(len(data))
+        n = geometry.size
+        if max(data, default=0) > n:
+            raise ValueError(f'格子的值超出0-{n}')
+        return cls([list(data[i:i + n]) for i in range(0, len(data), n)], **kwargs)
+
+    def to_string(self):
+        """把当前盘面转换为字符串，空格用'.'表示，大于9的数字用字母表示"""
+        chars = '.' + self.geometry.digit_chars
+        return ''.join(chars[num] for row in self.board for num in row)
+
+    def initialize_candidates(self):
+        """初始化每个空格的候选数"""
+        row_used, col_used, box_used = self.row_used, self.col_used, self.box_used
+        positions, box_of = self.geometry.positions, self.geometry.box_of
+        all_digits = self.geometry.all_digits
+        for i in range(self.size):
+            row_used[i] = col_used[i] = box_used[i] = 0
+        for idx, (i, j) in enumerate(positions):
+            num = self.board[i][j]
+            if num:
+                bit = digit_bit(num)
+                row_used[i] |= bit
+                col_used[j] |= bit
+                box_used[box_of[idx]] |= bit
+        masks = self.masks
+        for idx, (i, j) in enumerate(positions):
+            if self.board[i][j] == 0:
+                masks[idx] = all_digits & ~(row_used[i] | col_used[j] | box_used[box_of[idx]])
+            else:
+                masks[idx] = 0
+
+    def get_candidates(self, row, col):
+        """获取指定位置的所有候选数"""
+        return set(mask_to_digits(self.masks[row * self.size + col]))
+
+    def is_valid(self, row, col, num):
+        """检查在指定位置放置数字是否有效"""
+        used = self.row_used[row] | self.col_used[col] | self.box_used[self.geometry.box_of[row * self.size + col]]
+        return not used & digit_bit(num)
+
+    def find_empty(self):
+        """找到一个空位置"""
+        for i in range(self.size):
+            for j in range(self.size):
+                if self.board[i][j] == 0:
+                    return i, j
+        return None
+
+    def solve_step(self, techniques=TECHNIQUES):
+        """执行一步求解，返回是否找到解决方案
+
+        techniques 为可以使用的解题方法，默认为全部方法，可以用 techniques_up_to 限制难度。
+        """
+        # 按 TECHNIQUES 的顺序从易到难尝试各解题方法
+        stats = self.stats
+        for name, method, args in techniques:
+            technique = getattr(self, method)
+            if stats is None:
+                if technique(*args):
+                    return True
+            elif stats.measure(self, name, partial(technique, *args)):
+                return True
+
+        # 如果没有找到简单的解法，返回False
+        return False
+
+    def place(self, row, col, num):
+        """在指定位置填入数字，只更新同行、同列、同宫格子的候选数"""
+        stats = self.stats
+        if stats is not None:
+            start = perf_counter()
+        geometry = self.geometry
+        idx = row * geometry.size + col
+        bit = digit_bit(num)
+        masks, journal = self.masks, self.journal
+        # 日志项 (格子序号, 原掩码, 填入的数字)，数字为0表示只删除了候选数
+        journal.append((idx, masks[idx], num))
+        self.board[row][col] = num
+        self.row_used[row] |= bit
+        self.col_used[col] |= bit
+        self.box_used[geometry.box_of[idx]] |= bit
+        masks[idx] = 0
+
+        peers = geometry.peers[idx]
+        for peer in peers:
+            if masks[peer] & bit:
+                journal.append((peer, masks[peer], 0))
+                masks[peer] &= ~bit
+        if stats is not None:
+            stats.add('place', perf_counter() - start, len(peers))
+
+    def eliminate(self, row, col, mask):
+        """从指定格子删除掩码中的候选数，返回是否有候选数被删除"""
+        idx = row * self.size + col
+        old = self.masks[idx]
+        if not old & mask:
+            return False
+        self.journal.append((idx, old, 0))
+        self.masks[idx] = old & ~mask
+        return True
+
+    def mark(self):
+        """返回当前日志位置，供 undo 回退使用"""
+        return len(self.journal)
+
+    def undo(self, mark=None):
+        """回退到指定日志位置；不指定时撤销最近一次填数及其后的删除"""
+        journal = self.journal
+        if mark is None:
+            mark = len(journal)
+            while mark > 0:
+                mark -= 1
+                if journal[mark][2]:
+                    break
+        masks = self.masks
+        positions, box_of = self.geometry.positions, self.geometry.box_of
+        if len(journal) > mark:
+            self.journal_epoch += 1
+        while len(journal) > mark:
+            idx, old, num = journal.pop()
+            masks[idx] = old
+            if num:
+                row, col = positions[idx]
+                bit = digit_bit(num)
+                self.board[row][col] = 0
+                self.row_used[row] &= ~bit
+                self.col_used[col] &= ~bit
+                self.box_used[box_of[idx]] &= ~bit
+
+    def rewind(self, mark):
+        """回退到指定日志位置，返回被撤销的增量，交给 replay 可以重新前进到回退前的状态
+
+        增量项为 (格子序号, 原掩码, 新掩码, 填入的数字)，按原来的顺序排列。
+        """
+        journal, masks = self.journal, self.masks
+        # 从后往前，每一项的新掩码是它之后同一格子的原掩码，没有时为当前掩码
+        current = {}
+        delta = []
+        for position in range(len(journal) - 1, mark - 1, -1):
+            idx, old, num = journal[position]
+            delta.append((idx, old, current.get(idx, masks[idx]), num))
+            current[idx] = old
+        delta.reverse()
+        self.undo(mark)
+        return delta
+
+    def replay(self, delta):
+        """重新应用 rewind 返回的增量，日志随之恢复"""
+        journal, masks = self.journal, self.masks
+        positions, box_of = self.geometry.positions, self.geometry.box_of
+        for idx, old, new, num in delta:
+            journal.append((idx, old, num))
+            masks[idx] = new
+            if num:
+                row, col = positions[idx]
+                bit = digit_bit(num)
+                self.board[row][col] = num
+                self.row_used[row] |= bit
+                self.col_used[col] |= bit
+                self.box_used[box_of[idx]] |= bit
+
+    def tracker(self, name):
+        """返回指定解题方法的脏单元记录，并读入最新的日志"""
+        tracker = self.trackers.get(name)
+        if tracker is None:
+            tracker = self.trackers[name] = DirtyTracker(self.journal_epoch, self.geometry)
+        tracker.update(self.journal, self.journal_epoch)
+        return tracker
+
+    def solve_single_candidate(self):
+        """唯一候选数法：查找只有一个候选数的格子"""
+        tracker = self.tracker('single_candidate')
+        masks = self.masks
+        # 只检查上次扫描之后候选数变化过的格子
+        pending = tracker.cells
+        while pending:
+            low = pending & -pending
+            pending ^= low
+            idx = low.bit_length() - 1
+            self.scanned += 1
+            mask = masks[idx]
+            if mask and mask.bit_count() == 1:
+                # 未检查的格子保持为脏
+                tracker.cells = pending
+                num = mask.bit_length()
+                row, col = self.geometry.positions[idx]
+                self.place(row, col, num)
+                if self.trace:
+                    self.solution_steps.append(Step('single_candidate', (idx,), (num,), size=self.size))
+                return True
+        tracker.cells = 0
+        return False
+
+    def _unit_singles(self, cells):
+        """返回在给定格子中只出现一次的候选数掩码"""
+        masks = self.masks
+        once = twice = 0
+        for idx in cells:
+            mask = masks[idx]
+            twice |= once & mask
+            once |= mask
+        return once & ~twice
+
+    def _place_hidden_single(self, cells, singles):
+        """在给定格子中放置最小的唯一位置数字，返回格子序号和数字"""
+        bit = singles & -singles
+        for idx in cells:
+            if self.masks[idx] & bit:
+                row, col = self.geometry.positions[idx]
+                num = bit.bit_length()
+                self.place(row, col, num)
+                return idx, num
+
+    def solve_single_position(self):
+        """唯一位置法：在行/列/宫中查找只出现一次的候选数"""
+        dirty = self.tracker('single_position').units
+        # 依次检查每一行、每一列、每个宫格中变化过的数字
+        for unit, cells in enumerate(self.geometry.units):
+            if not dirty[unit]:
+                continue
+            self.scanned += self.size
+            singles = self._unit_singles(cells) & dirty[unit]
+            if not singles:
+                dirty[unit] = 0
+                continue
+            idx, num = self._place_hidden_single(cells, singles)
+            if self.trace:
+                self.solution_steps.append(Step('single_position', (idx,), (num,), (unit,), self.size))
+            return True
+
+        return False
+
+    def solve_naked_pairs(self):
+        """显性数对法：找出同一行/列/宫中两个格子具有相同的两个候选数"""
+        return self.solve_naked_subset(2)
+
+    def solve_naked_subset(self, size):
+        """显性数组法：同一行/列/宫中size个格子的候选数合起来恰好是size个数字时，
+        这些数字可以从该单元的其他格子中删除"""
+        masks, positions = self.masks, self.geometry.positions
+        dirty = self.tracker(NAKED_SUBSETS[size]).units
+        for unit, cells in enumerate(self.geometry.units):
+            if not dirty[unit]:
+                continue
+            self.scanned += self.size
+            # 只有候选数个数在2到size之间的格子才可能组成数组
+            members = [idx for idx in cells if 2 <= masks[idx].bit_count() <= size]
+            for chosen, digits in iter_subsets([masks[idx] for idx in members], size):
+                subset = [members[i] for i in chosen]
+                removed = False
+                for idx in cells:
+                    if idx not in subset and masks[idx] & digits:
+                        removed |= self.eliminate(*positions[idx], digits)
+
+                if removed:
+                    if self.trace:
+                        self.solution_steps.append(
+                            Step(NAKED_SUBSETS[size], tuple(subset), tuple(mask_to_digits(digits)), (unit,),
+                                 self.size))
+                    return True
+            dirty[unit] = 0
+        return False
+
+    def solve_hidden_subset(self, size):
+        """隐性数组法：同一行/列/宫中size个数字只能出现在相同的size个格子时，
+        这些格子中的其他候选数可以删除"""
+        masks, positions = self.masks, self.geometry.positions
+        n, all_digits = self.size, self.geometry.all_digits
+        dirty = self.tracker(HIDDEN_SUBSETS[size]).units
+        for unit, cells in enumerate(self.geometry.units):
+            if not dirty[unit]:
+                continue
+            self.scanned += n
+            # 每个数字在单元内可放位置的掩码，只保留位置数在2到size之间的数字
+            digits, places = [], []
+            for num in range(1, n + 1):
+                bit = digit_bit(num)
+                place_mask = 0
+                for k, idx in enumerate(cells):
+                    if masks[idx] & bit:
+                        place_mask |= 1 << k
+                if 2 <= place_mask.bit_count() <= size:
+                    digits.append(num)
+                    places.append(place_mask)
+
+            for chosen, place_mask in iter_subsets(places, size):
+                keep = 0
+                for i in chosen:
+                    keep |= digit_bit(digits[i])
+                subset = [cells[k] for k in range(n) if place_mask >> k & 1]
+                removed = False
+                for idx in subset:
+                    removed |= self.eliminate(*positions[idx], all_digits & ~keep)
+
+                if removed:
+                    if self.trace:
+                        self.solution_steps.append(
+                            Step(HIDDEN_SUBSETS[size], tuple(subset), tuple(digits[i] for i in chosen), (unit,),
+                                 self.size))
+                    return True
+            dirty[unit] = 0
+        return False
+
+    def solve_block_line_reduction(self):
+        """区块摒除法：当某个数字在一个宫格中只能出现在某一行或列时，该数字在此行或列的其他宫格中必须被删除；
+        反之，当某个数字在一行或一列中只能出现在某个宫格时，该数字在此宫格的其他格子中必须被删除"""
+        masks, n = self.masks, self.size
+        dirty = self.tracker('block_line_reduction').units
+
+        # 宫格对行/列的摒除，只检查宫格中候选位置变化过的数字；宫的单元编号从2n开始
+        for box, intersections in enumerate(self.geometry.box_intersections):
+            pending = dirty[2 * n + box]
+            if not pending:
+                continue
+            self.scanned += n
+            for num in mask_to_digits(pending):
+                bit = digit_bit(num)
+                for _, line, common, line_rest, box_rest in intersections:
+                    if self._remove_outside(bit, common, box_rest, line_rest):
+                        if self.trace:
+                            cells = tuple(idx for idx in common if masks[idx] & bit)
+                            self.solution_steps.append(
+                                Step('block_line_reduction', cells, (num,), (2 * n + box, line), n))
+                        return True
+            dirty[2 * n + box] = 0
+
+        # 行/列对宫格的摒除，只检查行/列中候选位置变化过的数字
+        for line, intersections in enumerate(self.geometry.line_intersections):
+            pending = dirty[line]
+            if not pending:
+                continue
+            self.scanned += n
+            for num in mask_to_digits(pending):
+                bit = digit_bit(num)
+                for box, _, common, line_rest, box_rest in intersections:
+                    if self._remove_outside(bit, common, line_rest, box_rest):
+                        if self.trace:
+                            cells = tuple(idx for idx in common if masks[idx] & bit)
+                            self.solution_steps.append(
+                                Step('block_line_reduction', cells, (num,), (line, 2 * n + box), n))
+                        return True
+            dirty[line] = 0
+        return False
+
+    def _remove_outside(self, bit, common, confined, targets):
+        """若数字出现在交集 common 中而不出现在 confined 中，则从 targets 中删除该数字"""
+        masks = self.masks
+        if not any(masks[idx] & bit for idx in common):
+            return False
+        if any(masks[idx] & bit for idx in confined):
+            return False
+        removed = False
+        positions = self.geometry.positions
+        for idx in targets:
+            removed |= self.eliminate(*positions[idx], bit)
+        return removed
+
+    def digit_bitboard(self, num):
+        """返回数字的位置位板 (rows, cols)：rows[r] 为该数字在第r行可放的列掩码，cols[c] 为在第c列可放的行掩码"""
+        bit = digit_bit(num)
+        rows, cols = [0] * self.size, [0] * self.size
+        positions = self.geometry.positions
+        self.scanned += len(positions)
+        for idx, mask in enumerate(self.masks):
+            if mask & bit:
+                row, col = positions[idx]
+                rows[row] |= 1 << col
+                cols[col] |= 1 << row
+        return rows, cols
+
+    def solve_fish(self, size):
+        """鱼形法（X翼/剑鱼/水母）：某个数字在size行中的位置都落在同样的size列上时，
+        该数字可以从这些列的其他行中删除；行列互换同理"""
+        n = self.size
+        dirty = self.tracker(FISH[size]).units
+        # 鱼形结构涉及整个盘面，只要数字在任意位置变化过就需要重新检查
+        pending = 0
+        for mask in dirty[:n]:
+            pending |= mask
+        for num in mask_to_digits(pending):
+            bit = digit_bit(num)
+            rows, cols = self.digit_bitboard(num)
+            for base_lines, cover_lines, by_row in ((rows, cols, True), (cols, rows, False)):
+                # 只有位置数在2到size之间的行（列）才可能作为鱼的底线
+                base = [i for i in range(n) if 2 <= base_lines[i].bit_count() <= size]
+                for chosen, cover in iter_subsets([base_lines[i] for i in base], size):
+                    lines = [base[i] for i in chosen]
+                    line_mask = 0
+                    for line in lines:
+                        line_mask |= 1 << line
+                    covers = [digit - 1 for digit in mask_to_digits(cover)]
+                    removed = False
+                    for cover_line in covers:
+                        for other in mask_to_digits(cover_lines[cover_line] & ~line_mask):
+                            row, col = (other - 1, cover_line) if by_row else (cover_line, other - 1)
+                            removed |= self.eliminate(row, col, bit)
+
+                    if removed:
+                        if self.trace:
+                            cells = tuple(
+                                line * n + cover_line if by_row else cover_line * n + line
+                                for line in lines for cover_line in covers
+                                if base_lines[line] >> cover_line & 1
+                            )
+                            # 底线单元在前，覆盖单元在后
+                            offset = 0 if by_row else n
+                            units = tuple(offset + line for line in lines) + tuple(n - offset + c for c in covers)
+                            self.solution_steps.append(Step(FISH[size], cells, (num,), units, n))
+                        return True
+            for unit in range(len(dirty)):
+                dirty[unit] &= ~bit
+        return False
+
+    def solve(self, use_search=True, techniques=TECHNIQUES):
+        """连续执行单步求解直到完成，逻辑方法无法继续时可回退到回溯搜索"""
+        while not self.is_solved():
+            if not self.solve_step(techniques):
+                return use_search and self.solve_search()
+        return True
+
+    def solve_search(self):
+        """回溯搜索：逻辑方法无法继续时，用最少候选数优先的搜索填完剩余格子"""
+        if self.stats is not None:
+            return self.stats.measure(self, 'search', self._solve_search)
+        return self._solve_search()
+
+    def _solve_search(self):
+        positions = self.geometry.positions
+        empty = tuple(idx for idx, (i, j) in enumerate(positions) if self.board[i][j] == 0)
+        if not empty:
+            return False
+        start = self.mark()
+        if not self._search():
+            self.undo(start)
+            return False
+        if self.trace:
+            values = tuple(self.board[i][j] for i, j in (positions[idx] for idx in empty))
+            self.solution_steps.append(Step('search', empty, values, size=self.size))
+        return True
+
+    def _search(self, since=None):
+        """递归搜索，成功时保留填好的盘面，失败时回退到进入时的状态
+
+        since 为上一层推理到不动点时的日志位置，推理只需从之后变化过的格子开始。
+        """
+        start = self.mark()
+        if not self._propagate(since):
+            self.undo(start)
+            return False
+
+        # 选择候选数最少的格子分支
+        masks = self.masks
+        self.scanned += len(masks)
+        best, best_count = -1, self.size + 1
+        for idx, mask in enumerate(masks):
+            if mask and mask.bit_count() < best_count:
+                best, best_count = idx, mask.bit_count()
+                if best_count == 2:
+                    break
+        if best < 0:
+            return True
+
+        row, col = self.geometry.positions[best]
+        mask = masks[best]
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            branch = self.mark()
+            self.place(row, col, bit.bit_length())
+            if self._search(branch):
+                return True
+            self.undo(branch)
+        self.undo(start)
+        return False
+
+    def _propagate(self, since=None):
+        """反复填入唯一候选数和唯一位置，发现矛盾时返回False
+
+        每轮只检查上一轮中候选数变化过的格子及其所在的单元，因此在大盘面上不会反复扫描整个盘面。
+        since 为 None 时第一轮检查全部格子和单元；否则盘面在日志位置 since 时已经推理到不动点，
+        第一轮只检查之后变化过的部分。
+        """
+        masks, board, journal = self.masks, self.board, self.journal
+        geometry = self.geometry
+        positions, n, all_digits = geometry.positions, geometry.size, geometry.all_digits
+        units, cell_units = geometry.units, geometry.cell_units
+        used_lines = (self.row_used, self.col_used, self.box_used)
+        if since is None:
+            cells, unit_ids = geometry.cells, range(len(units))
+        else:
+            cells = sorted({entry[0] for entry in islice(journal, since, None)})
+            unit_ids = sorted({unit for idx in cells for unit in cell_units[idx]})
+        while True:
+            start = len(journal)
+            for idx in cells:
+                mask = masks[idx]
+                if not mask:
+                    row, col = positions[idx]
+                    if board[row][col] == 0:
+                        return False
+                elif mask.bit_count() == 1:
+                    row, col = positions[idx]
+                    self.place(row, col, mask.bit_length())
+
+            for unit in unit_ids:
+                unit_cells = units[unit]
+                once = twice = 0
+                for idx in unit_cells:
+                    mask = masks[idx]
+                    twice |= once & mask
+                    once |= mask
+                # 某个数字在单元中既没有填入也没有可放的位置
+                if (once | used_lines[unit // n][unit % n]) != all_digits:
+                    return False
+                singles = once & ~twice
+                while singles:
+                    bit = singles & -singles
+                    singles ^= bit
+                    for idx in unit_cells:
+                        if masks[idx] & bit:
+                            break
+                    else:
+                        return False
+                    row, col = positions[idx]
+                    self.place(row, col, bit.bit_length())
+
+            if len(journal) == start:
+                return True
+            # 下一轮只检查这一轮中变化过的格子和它们所在的单元
+            cells = sorted({entry[0] for entry in islice(journal, start, None)})
+            unit_ids = sorted({unit for idx in cells for unit in cell_units[idx]})
+
+    def update_candidates(self):
+        """根据当前盘面重新计算所有空格的候选数
+
+        会丢弃之前删除的候选数并清空撤销日志，只在盘面被外部修改后使用。
+        """
+        stats = self.stats
+        if stats is not None:
+            start = perf_counter()
+        self.journal.clear()
+        self.journal_epoch += 1
+        self.initialize_candidates()
+        if stats is not None:
+            stats.add('update_candidates', perf_counter() - start, len(self.masks))
+
+    def is_solved(self):
+        """检查数独是否已解决"""
+        return all(0 not in row for row in self.board)
+
+    def has_conflicts(self):
+        """检查已填的数字是否在某个行、列或宫中重复"""
+        board, positions = self.board, self.geometry.positions
+        for cells in self.geometry.units:
+            seen = 0
+            for idx in cells:
+                row, col = positions[idx]
+                if board[row][col]:
+                    bit = digit_bit(board[row][col])
+                    if seen & bit:
+                        return True
+                    seen |= bit
+        return False
+
+    def count_solutions(self, limit=2):
+        """统计解的个数，达到 limit 个时立即停止，因此返回值不超过 limit
+
+        使用与回溯搜索相同的推理和最少候选数优先分支，结束后盘面恢复原状。
+        limit=2 时可以区分无解（0）、唯一解（1）和多解（2）。
+        """
+        if self.has_conflicts():
+            return 0
+        start = self.mark()
+        count = self._count(limit)
+        self.undo(start)
+        return count
+
+    def _count(self, limit, since=None):
+        start = self.mark()
+        if not self._propagate(since):
+            self.undo(start)
+            return 0
+
+        masks = self.masks
+        self.scanned += len(masks)
+        best, best_count = -1, self.size + 1
+        for idx, mask in enumerate(masks):
+            if mask and mask.bit_count() < best_count:
+                best, best_count = idx, mask.bit_count()
+                if best_count == 2:
+                    break
+        if best < 0:
+            self.undo(start)
+            return 1
+
+        row, col = self.geometry.positions[best]
+        mask = masks[best]
+        count = 0
+        while mask and count < limit:
+            bit = mask & -mask
+            mask ^= bit
+            branch = self.mark()
+            self.place(row, col, bit.bit_length())
+            count += self._count(limit - count, branch)
+            self.undo(branch)
+        self.undo(start)
+        return count
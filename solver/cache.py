@@ -0,0 +1,332 @@
+"""按规范形式缓存数独的解
+
+两个题目如果可以通过数字重新编号、转置、带内换行、栈内换列、交换整条带或整条栈互相得到，
+它们的规范形式相同，只需求解一次。规范形式是所有这些变换结果中字典序最小的一个
+（空格记为0，数字按出现顺序重新编号为1、2、3……），按行逐步搜索，每一行只保留取得最小值的分支。
+
+缓存以规范形式为键，保存解和解题步骤，命中时通过 Transform 把解和步骤映射回原题的方向和数字。
+内存中按最近最少使用淘汰，可选地用 SQLite 文件持久保存。
+给出数字很少或对称性很高的题目并列的分支极多，这些题目不计算规范形式，直接求解、不经过缓存。
+"""
+import json
+import sqlite3
+from collections import OrderedDict
+from itertools import permutations, product
+
+from solver.board import SudokuBoard
+from solver.steps import FISH_NAMES, Step
+from solver.units import UNITS
+
+# 规范形式搜索中同时保留的分支数上限，实际题目的分支数不超过几千个
+MAX_BRANCHES = 4096
+# 少于17个给出数字的题目不可能有唯一解，也不值得缓存
+MIN_GIVENS = 17
+# 三个一组的行或列（带/栈）内部的6种排列，以及带/栈之间的6种排列
+TRIPLE_ORDERS = tuple(permutations(range(3)))
+# 单元的格子集合到单元编号的映射，用于把步骤中的单元映射回原题
+UNIT_OF_CELLS = {frozenset(cells): unit for unit, cells in enumerate(UNITS)}
+# 映射回原题后需要重新排序数字和单元的步骤类型（数组和鱼形），其余类型的格子和数字一一对应
+SORTED_TYPES = (
+    'naked_pairs', 'naked_triples', 'naked_quads',
+    'hidden_pairs', 'hidden_triples', 'hidden_quads',
+) + tuple(FISH_NAMES)
+
+
+def parse_puzzle(puzzle):
+    """把81字符的题目解析为81个整数，格式错误时抛出 ValueError"""
+    puzzle = puzzle.strip()
+    if len(puzzle) != 81:
+        raise ValueError(f'需要81个字符，实际为{len(puzzle)}个')
+    try:
+        return [0 if char == '.' else int(char) for char in puzzle]
+    except ValueError:
+        raise ValueError(f'无效字符: {puzzle!r}') from None
+
+
+def has_duplicates(grid):
+    """检查81个整数的题目中是否有数字在某个行、列或宫中重复"""
+    for cells in UNITS:
+        values = [grid[idx] for idx in cells if grid[idx]]
+        if len(values) != len(set(values)):
+            return True
+    return False
+
+
+def first_row_orders(row):
+    """让首行取得最小值的全部列顺序
+
+    首行的数字互不相同，重新编号后总是1、2、3……，因此首行的值只取决于空格的位置：
+    给出数字最少的栈放在前面，栈内空格在前、数字在后。
+    返回 (空格位置的模式，0为空格、1为数字, 列顺序列表)。
+    """
+    stacks = [(sum(1 for col in range(stack * 3, stack * 3 + 3) if row[col]), stack) for stack in range(3)]
+    counts = sorted(count for count, _ in stacks)
+    value = tuple(0 if i % 3 < 3 - counts[i // 3] else 1 for i in range(9))
+    # 每个栈内空格和数字各自可以任意排列
+    stack_orders = {}
+    for _, stack in stacks:
+        cols = range(stack * 3, stack * 3 + 3)
+        blanks = [col for col in cols if not row[col]]
+        givens = [col for col in cols if row[col]]
+        stack_orders[stack] = [a + b for a in permutations(blanks) for b in permutations(givens)]
+    orders = []
+    for stack_order in TRIPLE_ORDERS:
+        if [stacks[stack][0] for stack in stack_order] != counts:
+            continue
+        for parts in product(*(stack_orders[stack] for stack in stack_order)):
+            orders.append(parts[0] + parts[1] + parts[2])
+    return value, orders
+
+
+def render_row(row, order, labels, next_label):
+    """按列顺序和编号表输出一行，遇到未编号的数字时按出现顺序编号"""
+    labels = labels[:]
+    values = []
+    for col in order:
+        num = row[col]
+        if num:
+            if not labels[num]:
+                labels[num] = next_label
+                next_label += 1
+            values.append(labels[num])
+        else:
+            values.append(0)
+    return tuple(values), labels, next_label
+
+
+class Transform:
+    """原题到规范形式的变换
+
+    cells[i] 为规范形式第 i 个格子在原题中的序号，digits[k] 为规范形式中数字 k 在原题中对应的数字。
+    """
+
+    __slots__ = ('cells', 'digits')
+
+    def __init__(self, cells, digits):
+        self.cells = cells
+        self.digits = digits
+
+    def apply(self, puzzle):
+        """把原题（81个整数）变换为规范形式的81字符字符串"""
+        inverse = [0] * 10
+        for label, num in enumerate(self.digits):
+            inverse[num] = label
+        return ''.join(str(inverse[puzzle[idx]]) if puzzle[idx] else '.' for idx in self.cells)
+
+    def solution(self, solution):
+        """把规范形式的解映射回原题"""
+        cells = ['.'] * 81
+        for idx, char in zip(self.cells, solution):
+            cells[idx] = str(self.digits[int(char)]) if char != '.' else '.'
+        return ''.join(cells)
+
+    def step(self, step):
+        """把规范形式上的解题步骤映射回原题"""
+        cells = tuple(self.cells[idx] for idx in step.cells)
+        digits = tuple(self.digits[num] for num in step.digits)
+        units = tuple(UNIT_OF_CELLS[frozenset(self.cells[idx] for idx in UNITS[unit])] for unit in step.units)
+        if step.type in SORTED_TYPES:
+            cells, digits = tuple(sorted(cells)), tuple(sorted(digits))
+            if step.type in FISH_NAMES:
+                # 鱼形的前一半单元为基础行/列，后一半为覆盖列/行，各自排序
+                size = len(units) // 2
+                units = tuple(sorted(units[:size])) + tuple(sorted(units[size:]))
+        return Step(step.type, cells, digits, units)
+
+
+def canonical_form(puzzle, max_branches=MAX_BRANCHES):
+    """计算题目的规范形式，返回 (规范形式的81字符字符串, Transform)
+
+    puzzle 可以是81字符的字符串或81个整数的列表。并列的分支数超过 max_branches 时放弃，返回 None。
+    """
+    grid = parse_puzzle(puzzle) if isinstance(puzzle, str) else list(puzzle)
+    transposed = [grid[col * 9 + row] for row in range(9) for col in range(9)]
+
+    # 每个分支为 (是否转置, 已选的行, 列顺序, 编号表, 下一个编号)
+    best, branches = None, []
+    for flipped, cells in ((False, grid), (True, transposed)):
+        rows = [cells[row * 9:row * 9 + 9] for row in range(9)]
+        for row in range(9):
+            value, orders = first_row_orders(rows[row])
+            if best is None or value < best:
+                best, branches = value, []
+            if value == best:
+                for order in orders:
+                    _, labels, next_label = render_row(rows[row], order, [0] * 10, 1)
+                    branches.append((flipped, rows, (row,), order, labels, next_label))
+            if len(branches) > max_branches:
+                return None
+    # 首行的值只比较了空格位置，实际的编号从任一分支输出
+    result = [render_row(branches[0][1][branches[0][2][0]], branches[0][3], [0] * 10, 1)[0]]
+
+    for position in range(1, 9):
+        best, survivors = None, []
+        for flipped, rows, chosen, order, labels, next_label in branches:
+            if position % 3:
+                # 带内剩余的行
+                band = chosen[-1] // 3
+                candidates = [row for row in range(band * 3, band * 3 + 3) if row not in chosen]
+            else:
+                # 尚未使用的带中的任意一行
+                used = {row // 3 for row in chosen}
+                candidates = [row for row in range(9) if row // 3 not in used]
+            for row in candidates:
+                value, new_labels, new_next = render_row(rows[row], order, labels, next_label)
+                if best is None or value < best:
+                    best, survivors = value, []
+                if value == best:
+                    survivors.append((flipped, rows, chosen + (row,), order, new_labels, new_next))
+                    if len(survivors) > max_branches:
+                        return None
+        branches = survivors
+        result.append(best)
+
+    # 所有剩下的分支得到相同的规范形式，取第一个构造变换
+    flipped, _, chosen, order, labels, next_label = branches[0]
+    if flipped:
+        cells = tuple(col * 9 + row for row in chosen for col in order)
+    else:
+        cells = tuple(row * 9 + col for row in chosen for col in order)
+    digits = [0] * 10
+    for num in range(1, 10):
+        if labels[num]:
+            digits[labels[num]] = num
+    # 题目中没有出现的数字按从小到大分配剩余的编号
+    missing = [num for num in range(1, 10) if not labels[num]]
+    for label, num in zip(range(next_label, 10), missing):
+        digits[label] = num
+    key = ''.join(str(num) if num else '.' for row in result for num in row)
+    return key, Transform(cells, tuple(digits))
+
+
+class CacheEntry:
+    """缓存的求解结果，solution 为规范形式的解（无解时为 None），steps 为解题步骤（未记录时为 None）"""
+
+    __slots__ = ('solution', 'steps')
+
+    def __init__(self, solution, steps=None):
+        self.solution = solution
+        self.steps = steps
+
+
+class PersistentLRU:
+    """内存中按最近最少使用淘汰、可选 SQLite 持久保存的缓存
+
+    maxsize 为内存中保留的条目数，超出时淘汰最久未使用的条目；
+    path 不为空时，条目同时写入该 SQLite 文件的 TABLE 表，内存中没有的条目会从文件中读取。
+    子类通过 encode/decode 在条目和可以 JSON 序列化的数据之间转换。
+    """
+
+    TABLE = 'entries'
+
+    def __init__(self, maxsize=4096, path=None):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        if path:
+            # 多个进程可能同时写入同一个文件
+            self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            self.db.execute(f'CREATE TABLE IF NOT EXISTS {self.TABLE} (key TEXT PRIMARY KEY, value TEXT)')
+
+    def __len__(self):
+        return len(self.entries)
+
+    def encode(self, entry):
+        return entry
+
+    def decode(self, data):
+        return data
+
+    def get(self, key):
+        """查找缓存条目，没有时返回 None"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            return entry
+        if self.db is None:
+            return None
+        row = self.db.execute(f'SELECT value FROM {self.TABLE} WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        entry = self.decode(json.loads(row[0]))
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key, entry):
+        """保存缓存条目"""
+        self._remember(key, entry)
+        if self.db is not None:
+            self.db.execute(f'INSERT OR REPLACE INTO {self.TABLE} VALUES (?, ?)',
+                            (key, json.dumps(self.encode(entry))))
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+class SolutionCache(PersistentLRU):
+    """以规范形式为键的求解结果缓存"""
+
+    TABLE = 'solutions'
+
+    def encode(self, entry):
+        steps = None
+        if entry.steps is not None:
+            steps = [[step.type, step.cells, step.digits, step.units] for step in entry.steps]
+        return [entry.solution, steps]
+
+    def decode(self, data):
+        solution, steps = data
+        if steps is not None:
+            steps = tuple(Step(type, tuple(cells), tuple(digits), tuple(units))
+                          for type, cells, digits, units in steps)
+        return CacheEntry(solution, steps)
+
+    def solve(self, puzzle, trace=False, stats=None):
+        """求解题目，返回 (解, 步骤)
+
+        解为与题目等长的字符串，无解时为 None；trace 为真时步骤为映射回原题的 Step 列表，否则为 None。
+        未命中时求解规范形式，stats 传给 SudokuBoard。格式错误时抛出 ValueError。
+        规范形式只对9x9定义，其他尺寸的题目、给出数字少于 MIN_GIVENS 个或分支数超过上限的题目
+        直接求解，不经过缓存。
+        """
+        if len(puzzle.strip()) != 81:
+            return self.solve_direct(puzzle, trace, stats)
+        grid = parse_puzzle(puzzle)
+        # 有重复数字的题目没有解，而且大量相同的数字会让规范形式的搜索分支数急剧膨胀
+        if has_duplicates(grid):
+            return None, [] if trace else None
+        canonical = canonical_form(grid) if sum(map(bool, grid)) >= MIN_GIVENS else None
+        if canonical is None:
+            return self.solve_direct(puzzle, trace, stats)
+        key, transform = canonical
+        entry = self.get(key)
+        if entry is None or (trace and entry.steps is None):
+            self.misses += 1
+            solver = SudokuBoard.from_string(key, trace=trace, stats=stats)
+            entry = CacheEntry(solver.to_string() if solver.solve() else None,
+                               tuple(solver.solution_steps) if trace else None)
+            self.put(key, entry)
+        else:
+            self.hits += 1
+        solution = transform.solution(entry.solution) if entry.solution is not None else None
+        steps = [transform.step(step) for step in entry.steps] if trace else None
+        return solution, steps
+
+    def solve_direct(self, puzzle, trace=False, stats=None):
+        """不经过缓存直接求解，返回值与 solve 相同"""
+        solver = SudokuBoard.from_string(puzzle.strip(), trace=trace, stats=stats)
+        if solver.has_conflicts():
+            return None, [] if trace else None
+        return solver.to_string() if solver.solve() else None, solver.solution_steps if trace else None
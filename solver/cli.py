@@ -0,0 +1,501 @@
+"""无界面的批量求解命令行
+
+用法：
+    python -m solver solve puzzles.txt -o solutions.txt -j 8
+    python -m solver filter puzzles.txt -o unique.txt --rejected rejected.txt
+    python -m solver generate -n 1000 -t naked_pairs --seed 1 -o generated.txt
+    python -m solver rate puzzles.txt -o ratings.tsv --cache-db ratings.db
+    python -m solver serve --socket /tmp/sudoku.sock -j 4
+    python -m solver request --socket /tmp/sudoku.sock solve puzzles.txt
+    python -m solver pack puzzles.txt -o corpus.sdb --solutions --ratings
+
+输入每行一个81字符的数独（'.'或'0'表示空格），空行和以'#'开头的行会被跳过。
+输入为文件时也可以是9x9的CSV或 packed 二进制格式（见 solver.importer），按扩展名或 --format 识别，
+无法解析的记录会在标准错误中报告，并在输出中对应一行'!invalid'。
+输出与输入顺序一致，每行为81位的解；无解的题目输出'!unsolvable'，格式错误输出'!invalid'。
+加上 --stats 时，结束后在标准错误输出各解题方法的调用次数、命中次数、扫描格子数和耗时。
+加上 --cache 或 --cache-db 时，每个进程用规范形式缓存（见 solver.cache）跳过重复或等价题目的求解。
+filter 子命令只输出有唯一解的题目，无解、多解和格式错误的题目被剔除。
+rate 子命令输出每个题目的难度分数、最难方法和各方法次数（见 solver.rating），以制表符分隔。
+generate 子命令按目标难度生成题目（见 solver.generator），结果按题目序号顺序逐批写出。
+serve 子命令启动本机求解服务（见 solver.service），request 子命令把题目发给服务，按输入顺序输出结果。
+pack 子命令把题目写入内存映射的题目库文件（见 solver.store），可以同时写入解和评级；
+.sdb 文件也可以作为其他子命令的输入。
+本模块不依赖tkinter。
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+from solver.board import TECHNIQUE_NAMES, SudokuBoard, techniques_up_to
+from solver.cache import SolutionCache
+from solver.generator import MAX_ATTEMPTS, generate_chunk
+from solver.importer import FORMATS, BadRecord, iter_records
+from solver.rating import RatingCache, rate, rate_board
+from solver.service import OPS, SolveClient, SolveService, serve
+from solver.stats import SolverStats
+from solver.store import BYTES, NIBBLES, StoreWriter
+from solver.units import geometry_for_cells
+
+UNSOLVABLE = '!unsolvable'
+INVALID = '!invalid'
+MULTIPLE = '!multiple'
+
+
+# 每个进程各自的缓存，按缓存类型在第一次使用时用 (条目数, SQLite 文件) 创建
+_caches = {}
+
+
+def get_cache(config, cache_class=SolutionCache):
+    """返回当前进程中 cache_class 类型的缓存，config 为 None 时不使用缓存"""
+    if config is None:
+        return None
+    cache = _caches.get(cache_class)
+    if cache is None:
+        cache = _caches[cache_class] = cache_class(*config)
+    return cache
+
+
+def solve_line(line, stats=None, cache=None):
+    """求解一行题目，返回输出行"""
+    if cache is not None:
+        try:
+            solution, _ = cache.solve(line, stats=stats)
+        except ValueError:
+            return INVALID
+        return UNSOLVABLE if solution is None else solution
+    try:
+        solver = SudokuBoard.from_string(line, trace=False, stats=stats)
+    except ValueError:
+        return INVALID
+    # 填满但有重复数字的盘面 solve() 也会返回 True
+    if solver.has_conflicts() or not solver.solve():
+        return UNSOLVABLE
+    return solver.to_string()
+
+
+def solve_chunk(lines, with_stats=False, cache=None):
+    """在工作进程中求解一批题目
+
+    with_stats 为真时返回 (结果列表, 统计字典)，统计字典由主进程合并。
+    cache 为缓存配置 (条目数, SQLite 文件)，为 None 时不使用缓存。
+    """
+    cache = get_cache(cache)
+    if not with_stats:
+        return [solve_line(line, cache=cache) for line in lines]
+    stats = SolverStats()
+    return [solve_line(line, stats, cache) for line in lines], stats.to_dict()
+
+
+def read_puzzles(stream):
+    """逐行读取题目，跳过空行和注释"""
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def read_file_puzzles(path, format=None):
+    """流式读取题目文件，无法解析的记录报告到标准错误，并以空题目占位使输出保持对齐"""
+    for number, puzzle, error in iter_records(path, format):
+        if error is not None:
+            print(f'{path}: {BadRecord(number, error)}', file=sys.stderr)
+            puzzle = ''
+        yield puzzle
+
+
+def iter_chunks(puzzles, chunksize):
+    """把题目流切分为固定大小的批次"""
+    puzzles = iter(puzzles)
+    while True:
+        chunk = list(islice(puzzles, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def map_chunks(func, chunks, jobs, args=()):
+    """按批次顺序逐个产出 func(批次, *args) 的结果，jobs 大于1时在进程池中执行
+
+    同时在途的批次数量有上限，因此内存占用与输入规模无关。
+    """
+    if jobs == 1:
+        for chunk in chunks:
+            yield func(chunk, *args)
+        return
+
+    with Pool(jobs) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(func, (chunk,) + args))
+            # 限制在途批次，避免一次性读入整个输入
+            if len(pending) >= jobs * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def solve_stream(puzzles, jobs=None, chunksize=256, stats=None, cache=None):
+    """按输入顺序逐个产出求解结果
+
+    传入 SolverStats 对象时，各批次的统计会合并到其中。
+    cache 为缓存配置 (条目数, SQLite 文件)，每个进程各自创建缓存。
+    """
+    jobs = jobs or os.cpu_count() or 1
+    for result in map_chunks(solve_chunk, iter_chunks(puzzles, chunksize), jobs, (stats is not None, cache)):
+        if stats is not None:
+            result, chunk_stats = result
+            stats.merge(chunk_stats)
+        yield from result
+
+
+def check_line(line):
+    """检查题目是否有唯一解，唯一解时返回题目本身，否则返回以原因开头的行"""
+    try:
+        solver = SudokuBoard.from_string(line, trace=False)
+    except ValueError:
+        return f'{INVALID} {line}'.rstrip()
+    count = solver.count_solutions(2)
+    if count == 1:
+        return line
+    return f'{UNSOLVABLE if count == 0 else MULTIPLE} {line}'
+
+
+def check_chunk(lines):
+    """在工作进程中检查一批题目"""
+    return [check_line(line) for line in lines]
+
+
+def run_solve(args):
+    """执行 solve 子命令"""
+    puzzles = read_puzzles(sys.stdin) if args.input == '-' else read_file_puzzles(args.input, args.format)
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    stats = SolverStats() if args.stats else None
+    cache = (args.cache_size, args.cache_db) if args.cache or args.cache_db else None
+    total = failed = 0
+    try:
+        for result in solve_stream(puzzles, args.jobs, args.chunksize, stats, cache):
+            target.write(result + '\n')
+            total += 1
+            failed += result.startswith('!')
+    finally:
+        puzzles.close()
+        if target is not sys.stdout:
+            target.close()
+    print(f'共处理{total}题，失败{failed}题', file=sys.stderr)
+    if stats is not None:
+        for line in stats.lines():
+            print(line, file=sys.stderr)
+    return 1 if failed else 0
+
+
+def run_filter(args):
+    """执行 filter 子命令"""
+    puzzles = read_puzzles(sys.stdin) if args.input == '-' else read_file_puzzles(args.input, args.format)
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    rejected = open(args.rejected, 'w', encoding='utf-8') if args.rejected else None
+    counts = {UNSOLVABLE: 0, MULTIPLE: 0, INVALID: 0}
+    total = 0
+    try:
+        jobs = args.jobs or os.cpu_count() or 1
+        for results in map_chunks(check_chunk, iter_chunks(puzzles, args.chunksize), jobs):
+            for result in results:
+                total += 1
+                if not result.startswith('!'):
+                    target.write(result + '\n')
+                    continue
+                counts[result.split(' ', 1)[0]] += 1
+                if rejected is not None:
+                    rejected.write(result + '\n')
+    finally:
+        puzzles.close()
+        if target is not sys.stdout:
+            target.close()
+        if rejected is not None:
+            rejected.close()
+    kept = total - sum(counts.values())
+    print(f'共检查{total}题，唯一解{kept}题，无解{counts[UNSOLVABLE]}题，'
+          f'多解{counts[MULTIPLE]}题，格式错误{counts[INVALID]}题', file=sys.stderr)
+    return 0
+
+
+def rate_line(line, cache=None):
+    """评定一行题目的难度，返回以制表符分隔的 题目、分数、最难方法、各方法次数"""
+    try:
+        rating = cache.rate(line) if cache is not None else rate(line)
+    except ValueError:
+        return f'{line}\t{INVALID}'
+    if not rating.solved:
+        return f'{line}\t{UNSOLVABLE}'
+    counts = ','.join(f'{name}={count}' for name, count in rating.counts.items())
+    return f'{line}\t{rating.score:.2f}\t{rating.hardest or "-"}\t{counts}'
+
+
+def rate_chunk(lines, cache=None):
+    """在工作进程中评定一批题目"""
+    cache = get_cache(cache, RatingCache)
+    return [rate_line(line, cache) for line in lines]
+
+
+def run_rate(args):
+    """执行 rate 子命令"""
+    puzzles = read_puzzles(sys.stdin) if args.input == '-' else read_file_puzzles(args.input, args.format)
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    cache = (args.cache_size, args.cache_db) if args.cache or args.cache_db else None
+    jobs = args.jobs or os.cpu_count() or 1
+    total = failed = 0
+    try:
+        for results in map_chunks(rate_chunk, iter_chunks(puzzles, args.chunksize), jobs, (cache,)):
+            for result in results:
+                total += 1
+                if result.startswith('\t'):
+                    # 文件中无法解析的记录以空题目占位，题目列改为它在输入中的序号，与 pack 的报告一致
+                    result = f'#{total}{result}'
+                target.write(result + '\n')
+                failed += '\t!' in result
+    finally:
+        puzzles.close()
+        if target is not sys.stdout:
+            target.close()
+    print(f'共评定{total}题，失败{failed}题', file=sys.stderr)
+    return 1 if failed else 0
+
+
+def run_generate(args):
+    """执行 generate 子命令"""
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    jobs = args.jobs or os.cpu_count() or 1
+    target_level = len(techniques_up_to(args.technique)) - 1
+    generated = easier = 0
+    try:
+        target.write(f'# technique={args.technique} seed={args.seed} count={args.count}\n')
+        chunks = iter_chunks(range(args.count), args.chunksize)
+        for puzzles in map_chunks(generate_chunk, chunks, jobs, (args.technique, args.seed, args.attempts)):
+            for puzzle, level in puzzles:
+                target.write(puzzle + '\n')
+                generated += 1
+                easier += level < target_level
+            # 每批写完立即落盘，中途停止时已生成的题目不会丢失
+            target.flush()
+    finally:
+        if target is not sys.stdout:
+            target.close()
+    # 目标难度是上限，尝试次数内没有恰好达到目标的题目也会输出，这里报告其数量
+    print(f'共生成{generated}题，其中{easier}题最难方法低于{args.technique}', file=sys.stderr)
+    return 0
+
+
+def run_serve(args):
+    """执行 serve 子命令，直到被中断"""
+    cache = (args.cache_size, args.cache_db) if args.cache or args.cache_db else None
+    service = SolveService(args.jobs, args.batch_size, args.batch_delay, args.queue_size, args.timeout,
+                           cache=cache)
+
+    def ready(address):
+        print(f'求解服务已启动: {address}', file=sys.stderr, flush=True)
+
+    try:
+        asyncio.run(serve(service, args.socket, args.host, args.port, ready))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    return 0
+
+
+def format_response(puzzle, op, response):
+    """把服务的响应转换为与 solve、rate 子命令相同的输出行，steps 输出一行 JSON"""
+    if not response['ok']:
+        error = '!' + response['error']
+        return error if op == 'solve' else f'{puzzle}\t{error}'
+    if op == 'solve':
+        return response['solution']
+    if op == 'steps':
+        return json.dumps({'puzzle': puzzle, 'solution': response['solution'], 'steps': response['steps']},
+                          ensure_ascii=False)
+    rating = response['rating']
+    counts = ','.join(f'{name}={count}' for name, count in rating['counts'].items())
+    return f'{puzzle}\t{rating["score"]:.2f}\t{rating["hardest"] or "-"}\t{counts}'
+
+
+def run_request(args):
+    """执行 request 子命令"""
+    puzzles = read_puzzles(sys.stdin) if args.input == '-' else read_file_puzzles(args.input, args.format)
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    total = failed = 0
+    try:
+        with SolveClient(args.socket, args.host, args.port) as client:
+            # 输入题目与响应一一对应，需要同时保留题目用于输出
+            window = deque()
+
+            def sent():
+                for puzzle in puzzles:
+                    window.append(puzzle)
+                    yield puzzle
+
+            for response in client.map(args.op, sent(), args.timeout):
+                target.write(format_response(window.popleft(), args.op, response) + '\n')
+                total += 1
+                failed += not response['ok']
+    finally:
+        puzzles.close()
+        if target is not sys.stdout:
+            target.close()
+    print(f'共请求{total}题，失败{failed}题', file=sys.stderr)
+    return 1 if failed else 0
+
+
+def pack_line(line, solutions=False, ratings=False):
+    """求出一行题目的 (题目, 解, 评级分数)，格式错误时题目为 None，无解时解和分数为 None"""
+    try:
+        board = SudokuBoard.from_string(line, trace=False)
+    except ValueError:
+        return None, None, None
+    score = None
+    if board.has_conflicts():
+        # 填满但有重复数字的盘面 solve() 也会返回 True
+        return line, None, None
+    if ratings:
+        # 评级时盘面会被解出
+        score = rate_board(board).score
+        solved = score is not None
+    else:
+        solved = board.solve()
+    return line, board.to_string() if solved and solutions else None, score
+
+
+def pack_chunk(lines, solutions=False, ratings=False):
+    """在工作进程中准备一批要写入题目库的记录"""
+    return [pack_line(line, solutions, ratings) for line in lines]
+
+
+def run_pack(args):
+    """执行 pack 子命令"""
+    puzzles = read_puzzles(sys.stdin) if args.input == '-' else read_file_puzzles(args.input, args.format)
+    encoding = NIBBLES if args.nibbles else BYTES
+    if args.solutions or args.ratings:
+        jobs = args.jobs or os.cpu_count() or 1
+        chunks = map_chunks(pack_chunk, iter_chunks(puzzles, args.chunksize), jobs, (args.solutions, args.ratings))
+        records = (record for chunk in chunks for record in chunk)
+    else:
+        # 只写题目时不需要求解，直接在主进程中编码；无法解析的记录以空题目占位
+        records = ((puzzle or None, None, None) for puzzle in puzzles)
+    writer = None
+    total = skipped = 0
+    try:
+        for puzzle, solution, score in records:
+            total += 1
+            try:
+                if puzzle is None:
+                    raise ValueError('格式错误')
+                if writer is None:
+                    # 题目库的尺寸由第一个题目决定
+                    box = geometry_for_cells(len(puzzle)).box
+                    writer = StoreWriter(args.output, box, encoding, args.solutions, args.ratings)
+                writer.add(puzzle, solution, score)
+            except ValueError as error:
+                print(f'跳过第{total}题: {error}', file=sys.stderr)
+                skipped += 1
+        if writer is None:
+            writer = StoreWriter(args.output, 3, encoding, args.solutions, args.ratings)
+    finally:
+        puzzles.close()
+        if writer is not None:
+            writer.close()
+    print(f'共写入{writer.count}题，跳过{skipped}题', file=sys.stderr)
+    return 1 if skipped else 0
+
+
+def add_address_arguments(parser):
+    parser.add_argument('--socket', help='Unix 域套接字的路径，不指定时使用 TCP')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP 地址')
+    parser.add_argument('--port', type=int, default=8765, help='TCP 端口')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m solver', description='数独批量求解工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    solve_parser = subparsers.add_parser('solve', help='批量求解题目')
+    solve_parser.add_argument('input', nargs='?', default='-', help="输入文件，'-'表示标准输入")
+    solve_parser.add_argument('-o', '--output', default='-', help="输出文件，'-'表示标准输出")
+    solve_parser.add_argument('--format', choices=sorted(FORMATS), help='输入文件格式，默认按扩展名识别')
+    solve_parser.add_argument('-j', '--jobs', type=int, default=None, help='工作进程数，默认为CPU核数')
+    solve_parser.add_argument('--chunksize', type=int, default=256, help='每批分发给工作进程的题目数')
+    solve_parser.add_argument('--stats', action='store_true', help='输出各解题方法的调用次数、命中次数和耗时')
+    solve_parser.add_argument('--cache', action='store_true', help='用规范形式缓存跳过重复或等价题目的求解')
+    solve_parser.add_argument('--cache-size', type=int, default=4096, help='每个进程在内存中缓存的题目数')
+    solve_parser.add_argument('--cache-db', help='把缓存持久保存到该 SQLite 文件（隐含 --cache）')
+    solve_parser.set_defaults(func=run_solve)
+
+    filter_parser = subparsers.add_parser('filter', help='只保留有唯一解的题目')
+    filter_parser.add_argument('input', nargs='?', default='-', help="输入文件，'-'表示标准输入")
+    filter_parser.add_argument('-o', '--output', default='-', help="唯一解题目的输出文件，'-'表示标准输出")
+    filter_parser.add_argument('--rejected', help="把被剔除的题目连同原因（'!unsolvable'、'!multiple'、'!invalid'）写入该文件")
+    filter_parser.add_argument('--format', choices=sorted(FORMATS), help='输入文件格式，默认按扩展名识别')
+    filter_parser.add_argument('-j', '--jobs', type=int, default=None, help='工作进程数，默认为CPU核数')
+    filter_parser.add_argument('--chunksize', type=int, default=256, help='每批分发给工作进程的题目数')
+    filter_parser.set_defaults(func=run_filter)
+
+    rate_parser = subparsers.add_parser('rate', help='按解题方法评定题目难度')
+    rate_parser.add_argument('input', nargs='?', default='-', help="输入文件，'-'表示标准输入")
+    rate_parser.add_argument('-o', '--output', default='-', help="输出文件，'-'表示标准输出")
+    rate_parser.add_argument('--format', choices=sorted(FORMATS), help='输入文件格式，默认按扩展名识别')
+    rate_parser.add_argument('-j', '--jobs', type=int, default=None, help='工作进程数，默认为CPU核数')
+    rate_parser.add_argument('--chunksize', type=int, default=256, help='每批分发给工作进程的题目数')
+    rate_parser.add_argument('--cache', action='store_true', help='按题目缓存评级结果')
+    rate_parser.add_argument('--cache-size', type=int, default=4096, help='每个进程在内存中缓存的题目数')
+    rate_parser.add_argument('--cache-db', help='把评级结果持久保存到该 SQLite 文件（隐含 --cache）')
+    rate_parser.set_defaults(func=run_rate)
+
+    generate_parser = subparsers.add_parser('generate', help='按目标难度生成题目')
+    generate_parser.add_argument('-n', '--count', type=int, default=100, help='生成的题目数')
+    generate_parser.add_argument('-t', '--technique', choices=TECHNIQUE_NAMES, default='single_position',
+                                 help='题目可以用到的最难解题方法，优先生成恰好需要该方法的题目')
+    generate_parser.add_argument('--seed', type=int, default=0, help='随机数种子，同样的参数总是生成同样的题目')
+    generate_parser.add_argument('--attempts', type=int, default=MAX_ATTEMPTS, help='每个题目最多尝试的终盘数，都达不到目标时采用其中最难的一个')
+    generate_parser.add_argument('-o', '--output', default='-', help="输出文件，'-'表示标准输出")
+    generate_parser.add_argument('-j', '--jobs', type=int, default=None, help='工作进程数，默认为CPU核数')
+    generate_parser.add_argument('--chunksize', type=int, default=4, help='每批分发给工作进程的题目数')
+    generate_parser.set_defaults(func=run_generate)
+
+    serve_parser = subparsers.add_parser('serve', help='启动本机求解服务')
+    add_address_arguments(serve_parser)
+    serve_parser.add_argument('-j', '--jobs', type=int, default=None, help='工作进程数，默认为CPU核数')
+    serve_parser.add_argument('--batch-size', type=int, default=64, help='每批交给工作进程的最大请求数')
+    serve_parser.add_argument('--batch-delay', type=float, default=0.002, help='凑批时最多等待的秒数')
+    serve_parser.add_argument('--queue-size', type=int, default=1024, help='等待队列长度，队列满时暂停读取请求')
+    serve_parser.add_argument('--timeout', type=float, default=10.0, help='请求没有指定期限时的默认期限（秒）')
+    serve_parser.add_argument('--cache', action='store_true', help='每个工作进程缓存求解和评级结果')
+    serve_parser.add_argument('--cache-size', type=int, default=4096, help='每个进程在内存中缓存的题目数')
+    serve_parser.add_argument('--cache-db', help='把缓存持久保存到该 SQLite 文件（隐含 --cache）')
+    serve_parser.set_defaults(func=run_serve)
+
+    request_parser = subparsers.add_parser('request', help='把题目发给求解服务')
+    add_address_arguments(request_parser)
+    request_parser.add_argument('op', choices=OPS, help='solve 求解、rate 评级、steps 求解并输出解题步骤')
+    request_parser.add_argument('input', nargs='?', default='-', help="输入文件，'-'表示标准输入")
+    request_parser.add_argument('-o', '--output', default='-', help="输出文件，'-'表示标准输出")
+    request_parser.add_argument('--format', choices=sorted(FORMATS), help='输入文件格式，默认按扩展名识别')
+    request_parser.add_argument('--timeout', type=float, help='每个请求的期限（秒），默认使用服务的设置')
+    request_parser.set_defaults(func=run_request)
+
+    pack_parser = subparsers.add_parser('pack', help='把题目写入内存映射的题目库文件')
+    pack_parser.add_argument('input', nargs='?', default='-', help="输入文件，'-'表示标准输入")
+    pack_parser.add_argument('-o', '--output', required=True, help='题目库文件（.sdb）')
+    pack_parser.add_argument('--format', choices=sorted(FORMATS), help='输入文件格式，默认按扩展名识别')
+    pack_parser.add_argument('--nibbles', action='store_true', help='每个格子占半个字节（每题41字节，只支持9x9）')
+    pack_parser.add_argument('--solutions', action='store_true', help='同时求解并写入解列')
+    pack_parser.add_argument('--ratings', action='store_true', help='同时评级并写入评级列')
+    pack_parser.add_argument('-j', '--jobs', type=int, default=None, help='工作进程数，默认为CPU核数')
+    pack_parser.add_argument('--chunksize', type=int, default=256, help='每批分发给工作进程的题目数')
+    pack_parser.set_defaults(func=run_pack)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
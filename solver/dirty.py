@@ -0,0 +1,51 @@
+"""解题方法的脏单元跟踪
+
+每个解题方法持有一个 DirtyTracker，记录它上次扫描之后哪些格子、
+哪些单元中的哪些数字发生过变化。变化从 SudokuBoard 的撤销日志中读取，
+因此填数和删除候选数本身没有额外开销。方法只需重新扫描脏的部分，
+扫描后没有发现结果的部分再标记为干净。
+"""
+from itertools import islice
+
+from solver.units import STANDARD
+
+
+class DirtyTracker:
+    """记录某个解题方法尚未重新扫描的格子和单元"""
+
+    __slots__ = ('geometry', 'position', 'epoch', 'cells', 'units')
+
+    def __init__(self, epoch=0, geometry=STANDARD):
+        self.geometry = geometry
+        self.reset(epoch)
+
+    def reset(self, epoch):
+        """标记全部格子和单元为脏，下次需要完整扫描"""
+        geometry = self.geometry
+        self.position = 0
+        self.epoch = epoch
+        # 脏格子按位存放在一个整数中，每个格子一位
+        self.cells = (1 << geometry.cell_count) - 1
+        # 每个单元中变化过的数字掩码
+        self.units = [geometry.all_digits] * len(geometry.units)
+
+    def update(self, journal, epoch):
+        """读取上次之后新增的日志项，把涉及的格子和单元标记为脏
+
+        日志被回退或清空后 epoch 会变化，此时无法得知哪些部分变化过，直接回到完整扫描。
+        """
+        if epoch != self.epoch:
+            self.reset(epoch)
+            self.position = len(journal)
+            return
+        cells, units = self.cells, self.units
+        cell_units = self.geometry.cell_units
+        for idx, old, _ in islice(journal, self.position, None):
+            cells |= 1 << idx
+            # 原掩码包含了所有可能被删除的数字
+            row, col, box = cell_units[idx]
+            units[row] |= old
+            units[col] |= old
+            units[box] |= old
+        self.cells = cells
+        self.position = len(journal)
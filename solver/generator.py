@@ -0,0 +1,108 @@
+"""按目标难度生成数独题目
+
+每个题目先用随机化的回溯搜索生成一个完整的终盘，再按随机顺序逐个挖去数字：
+挖去后如果只用不超过目标难度的解题方法（solve_step 中的 TECHNIQUES）仍能解出，就保留这次挖空，
+否则把数字填回去。挖空后出现多解的情况先用 count_solutions 快速排除。
+目标难度是上限：挖完的题目都只需要不超过目标的方法。优先采用最难方法恰好是目标方法的题目，
+否则换一个终盘重试，尝试次数用完时采用其中最难的一个，因此每个题目都能生成。
+
+第 index 个题目使用由 (seed, index) 确定的随机数，因此同样的参数总是生成同样的题目，
+与工作进程数和批次大小无关。
+"""
+import random
+
+from solver.board import SudokuBoard, mask_to_digits, techniques_up_to
+from solver.rating import count_techniques
+
+# 每个题目最多尝试的终盘数，超过后采用已生成的题目中最难的一个
+MAX_ATTEMPTS = 20
+
+
+def task_random(seed, index):
+    """第 index 个题目使用的随机数生成器"""
+    return random.Random(f'{seed}:{index}')
+
+
+def _fill(board, rng):
+    """随机化的回溯搜索，按随机顺序尝试最少候选数格子的各个候选数"""
+    start = board.mark()
+    if not board._propagate():
+        board.undo(start)
+        return False
+    masks = board.masks
+    best, best_count = -1, board.size + 1
+    for idx, mask in enumerate(masks):
+        if mask and mask.bit_count() < best_count:
+            best, best_count = idx, mask.bit_count()
+    if best < 0:
+        return True
+    row, col = divmod(best, board.size)
+    digits = mask_to_digits(masks[best])
+    rng.shuffle(digits)
+    for num in digits:
+        branch = board.mark()
+        board.place(row, col, num)
+        if _fill(board, rng):
+            return True
+        board.undo(branch)
+    board.undo(start)
+    return False
+
+
+def random_grid(rng, box=3):
+    """生成一个宫格边长为 box 的随机完整终盘，返回终盘的字符串"""
+    board = SudokuBoard(trace=False, box=box)
+    _fill(board, rng)
+    return board.to_string()
+
+
+def hardest_technique(puzzle, techniques):
+    """只用 techniques 求解题目，返回用到的最难方法在 techniques 中的序号
+
+    无法解出时返回 None，不需要任何方法（题目已经填满）时返回 -1。
+    """
+    board = SudokuBoard.from_string(puzzle, trace=False)
+    counts = count_techniques(board, techniques)
+    if not board.is_solved():
+        return None
+    return max((level for level, count in enumerate(counts) if count), default=-1)
+
+
+def dig(grid, techniques, rng):
+    """从终盘中按随机顺序挖去数字，保持题目只用 techniques 就能解出"""
+    cells = list(grid)
+    order = list(range(len(cells)))
+    rng.shuffle(order)
+    for idx in order:
+        value = cells[idx]
+        cells[idx] = '.'
+        puzzle = ''.join(cells)
+        # 先用回溯计数排除多解的情况，比逻辑方法卡住后再放弃快得多
+        if (SudokuBoard.from_string(puzzle, trace=False).count_solutions(2) != 1
+                or hardest_technique(puzzle, techniques) is None):
+            cells[idx] = value
+    return ''.join(cells)
+
+
+def generate_puzzle(technique, rng, attempts=MAX_ATTEMPTS):
+    """生成一个只需要不超过 technique 的方法就能解出的9x9题目
+
+    返回 (题目, 最难方法在 techniques_up_to(technique) 中的序号)。优先返回最难方法恰好是 technique 的题目，
+    attempts 个终盘都达不到时返回其中最难的一个。
+    """
+    techniques = techniques_up_to(technique)
+    best, best_level = None, -2
+    for _ in range(max(attempts, 1)):
+        puzzle = dig(random_grid(rng), techniques, rng)
+        level = hardest_technique(puzzle, techniques)
+        if level == len(techniques) - 1:
+            return puzzle, level
+        if level > best_level:
+            best, best_level = puzzle, level
+    return best, best_level
+
+
+def generate_chunk(indices, technique, seed, attempts=MAX_ATTEMPTS):
+    """在工作进程中生成一批题目，返回 (题目, 最难方法的序号) 的列表"""
+    return [generate_puzzle(technique, task_random(seed, index), attempts) for index in indices]
+
@@ -0,0 +1,57 @@
+"""解题过程的快照历史，支持后退、跳转到任意步骤和重新前进
+
+SudokuBoard 的撤销日志本身就是按步骤排列的增量记录，因此每个快照只保存一个日志位置，不复制盘面：
+后退时用 rewind 回退日志并保存被撤销的增量，前进时用 replay 重新应用这些增量，不需要重新求解。
+所有快照共用同一份增量，内存占用只与各步改动的格子数成正比。
+"""
+
+
+class SolveHistory:
+    """SudokuBoard 的快照历史
+
+    快照0为开始记录时的盘面，快照 k 为第 k 步之后的盘面（含候选数），position 为盘面当前所在的快照。
+    记录期间不能用 update_candidates 等方式清空盘面的撤销日志。
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.marks = [board.mark()]
+        self.steps = [None]
+        self.position = 0
+        # 当前快照之后已经记录、但已被回退的日志增量
+        self.future = []
+
+    def __len__(self):
+        return len(self.marks)
+
+    @property
+    def last(self):
+        return len(self.marks) - 1
+
+    def at_end(self):
+        return self.position == self.last
+
+    def record(self, steps):
+        """在最后一个快照之后记录一次求解产生的步骤，盘面必须位于最后一个快照
+
+        一次求解产生多个步骤时，这些步骤共用求解结束时的快照。
+        """
+        if not self.at_end():
+            raise ValueError('只能在最后一个快照之后记录新的步骤')
+        mark = self.board.mark()
+        for step in steps:
+            self.marks.append(mark)
+            self.steps.append(step)
+        self.position = self.last
+
+    def goto(self, index):
+        """把盘面移动到快照 index"""
+        if not 0 <= index <= self.last:
+            raise IndexError(f'快照序号超出范围: {index}')
+        if index < self.position:
+            self.future[:0] = self.board.rewind(self.marks[index])
+        elif index > self.position:
+            count = self.marks[index] - self.marks[self.position]
+            self.board.replay(self.future[:count])
+            del self.future[:count]
+        self.position = index
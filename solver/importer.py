@@ -0,0 +1,260 @@
+"""从文件中流式读取多个数独题目
+
+支持四种格式：
+    lines   每行一个题目，'.'或'0'表示空格，空行和以'#'开头的行会被跳过
+    csv     每个题目为n行、每行n个逗号分隔的格子，空格可以留空或写0，题目之间可用空行分隔
+    packed  紧凑二进制格式，每个题目41字节，每个格子占半个字节（高4位在前），最后半个字节为0
+    store   内存映射的题目库文件（见 solver.store），只读取题目列，支持各种尺寸
+
+lines 和 csv 格式支持4x4、9x9、16x16和25x25的题目：lines 格式按行的长度（16、81、256、625）识别尺寸，
+大于9的数字用字母A、B、C……表示；csv 格式按最宽一行的格子数（或空行之间的行数）识别尺寸，格子写数字。
+packed 格式每个格子只有4位，只支持9x9的题目。
+题目以生成器的形式逐个产出，统一为空格为'.'的字符串。大文件通过内存映射读取，
+整个文件不会被读入内存。格式错误的记录通过 BadRecord 报告，不会中断读取。
+"""
+import mmap
+import os
+
+from solver.store import MAGIC, PuzzleStore
+from solver.units import DIGIT_CHARS, STANDARD, geometry, geometry_for_cells
+
+# 超过该大小的文件使用内存映射读取
+MMAP_THRESHOLD = 16 * 1024 * 1024
+# packed 格式每个题目的字节数
+PACKED_SIZE = 41
+# 非内存映射时 packed 格式每次读取的题目数
+PACKED_BATCH = 4096
+
+# lines 格式中允许的字符，按格子数区分尺寸
+PUZZLE_CHARS = {
+    box ** 4: b'.0' + geometry(box).digit_chars.encode('ascii')
+    for box in (2, 3, 4, 5)
+}
+# csv 格式支持的边长
+CSV_SIZES = frozenset(box * box for box in (2, 3, 4, 5))
+# csv 格式在未遇到空行时最多缓存的行数，即最大题目的行数
+CSV_BUFFER = max(CSV_SIZES)
+# packed 格式中每个字节对应的两个格子，格子的值超过9时为空字符串
+PACKED_PAIRS = tuple(
+    (str(high) + str(low)).replace('0', '.') if high <= 9 and low <= 9 else ''
+    for high, low in (divmod(byte, 16) for byte in range(256))
+)
+# 按扩展名识别格式，其余扩展名按文件开头的内容识别
+SNIFF_SIZE = 4096
+EXTENSIONS = {'.csv': 'csv', '.bin': 'packed', '.sdk': 'packed', '.sdb': 'store'}
+
+
+class BadRecord:
+    """一条无法解析的记录
+
+    number 为记录的位置：文本格式为行号（CSV为题目的第一行），packed 格式为题目序号，均从1开始。
+    """
+
+    __slots__ = ('number', 'reason')
+
+    def __init__(self, number, reason):
+        self.number = number
+        self.reason = reason
+
+    def __str__(self):
+        return f'第{self.number}条记录: {self.reason}'
+
+    def __repr__(self):
+        return f'BadRecord({self.number!r}, {self.reason!r})'
+
+
+def detect_format(path):
+    """根据扩展名判断文件格式，其他扩展名按内容判断：题目库的魔数为 store，
+    第一个非空、非注释行中有逗号为 csv，否则为 lines
+    """
+    format = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if format is not None:
+        return format
+    with open(path, 'rb') as file:
+        head = file.read(SNIFF_SIZE)
+    if head.startswith(MAGIC):
+        return 'store'
+    for line in head.splitlines():
+        line = line.strip()
+        if line and not line.startswith(b'#'):
+            return 'csv' if b',' in line else 'lines'
+    return 'lines'
+
+
+def read_lines(path):
+    """逐行产出文件内容（bytes），大文件使用内存映射"""
+    with open(path, 'rb') as file:
+        # 空文件无法映射
+        if os.fstat(file.fileno()).st_size < max(MMAP_THRESHOLD, 1):
+            yield from file
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            yield from iter(view.readline, b'')
+
+
+def read_blocks(path, size):
+    """逐个产出固定长度的记录（bytes），大文件使用内存映射，最后不足长度的部分原样产出"""
+    with open(path, 'rb') as file:
+        length = os.fstat(file.fileno()).st_size
+        if length < max(MMAP_THRESHOLD, 1):
+            while True:
+                data = file.read(size * PACKED_BATCH)
+                if not data:
+                    return
+                for start in range(0, len(data), size):
+                    yield data[start:start + size]
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            for start in range(0, length, size):
+                yield view[start:start + size]
+
+
+def parse_line(line):
+    """解析 lines 格式的一行，返回题目字符串，格式错误时抛出 ValueError"""
+    chars = PUZZLE_CHARS.get(len(line))
+    if chars is None:
+        geometry_for_cells(len(line))
+    if len(line) > 81:
+        # 大于9的数字不区分大小写
+        line = line.upper()
+    invalid = line.translate(None, chars)
+    if invalid:
+        raise ValueError(f'无效字符: {invalid[:1].decode("latin-1")!r}')
+    return line.replace(b'0', b'.').decode('ascii')
+
+
+def parse_csv_cell(cell, size=9):
+    """解析一个CSV格子，空格和无法识别的内容视为空格，size 为盘面边长"""
+    cell = cell.strip(b' \t\r\n"')
+    if not cell.isdigit():
+        return '.'
+    num = int(cell)
+    if num > size:
+        raise ValueError(f'数值必须在0-{size}之间: {num}')
+    return DIGIT_CHARS[num - 1] if num else '.'
+
+
+def parse_csv_rows(rows, size=9):
+    """解析 size 行CSV，每行不足 size 个格子时补空格，超过时只取前 size 个"""
+    cells = []
+    for row in rows:
+        values = [parse_csv_cell(cell, size) for cell in row.split(b',')[:size]]
+        cells.extend(values + ['.'] * (size - len(values)))
+    return ''.join(cells)
+
+
+def csv_size(rows, complete):
+    """判断连续的若干CSV行中题目的边长
+
+    complete 为真表示这些行前后都是空行或文件边界，此时行数恰好为支持的边长且不小于最宽一行的格子数时以行数为准；
+    否则按最宽一行的格子数判断，不是支持的尺寸时按9x9读取。
+    """
+    width = max(len(row.split(b',')) for row in rows)
+    if complete and len(rows) in CSV_SIZES and width <= len(rows):
+        return len(rows)
+    return width if width in CSV_SIZES else STANDARD.size
+
+
+def iter_lines_format(path):
+    for number, line in enumerate(read_lines(path), 1):
+        line = line.strip()
+        if not line or line.startswith(b'#'):
+            continue
+        try:
+            yield number, parse_line(line), None
+        except ValueError as error:
+            yield number, None, str(error)
+
+
+def split_csv_rows(numbers, rows, complete):
+    """把缓存的CSV行按边长切分为题目，产出 (记录位置, 题目字符串, 错误说明)
+
+    numbers 为每行的行号。complete 为真时剩余不足一个题目的行报告为错误，否则留在 numbers 和 rows 中等待后续的行。
+    """
+    size = csv_size(rows, complete)
+    end = len(rows) - len(rows) % size
+    for start in range(0, end, size):
+        try:
+            yield numbers[start], parse_csv_rows(rows[start:start + size], size), None
+        except ValueError as error:
+            yield numbers[start], None, str(error)
+    if complete and end < len(rows):
+        yield numbers[end], None, f'只有{len(rows) - end}行，需要{size}行'
+        end = len(rows)
+    del numbers[:end], rows[:end]
+
+
+def iter_csv_format(path):
+    # 空行之间的行先缓存起来，按其中最宽的一行判断边长，第一行格子不足的题目也能识别；
+    # 题目之间没有空行时最多缓存一个最大题目的行数
+    numbers, rows = [], []
+    for number, line in enumerate(read_lines(path), 1):
+        if number == 1 and line.startswith(b'\xef\xbb\xbf'):
+            line = line[3:]
+        if not line.strip():
+            if rows:
+                yield from split_csv_rows(numbers, rows, True)
+            continue
+        numbers.append(number)
+        rows.append(line)
+        if len(rows) == CSV_BUFFER:
+            yield from split_csv_rows(numbers, rows, False)
+    if rows:
+        yield from split_csv_rows(numbers, rows, True)
+
+
+def iter_packed_format(path):
+    for number, record in enumerate(read_blocks(path, PACKED_SIZE), 1):
+        if len(record) != PACKED_SIZE:
+            yield number, None, f'记录不完整，只有{len(record)}字节'
+            continue
+        text = ''.join([PACKED_PAIRS[byte] for byte in record])
+        if len(text) != 82 or text[81] != '.':
+            yield number, None, '格子的值超出0-9'
+            continue
+        yield number, text[:81], None
+
+
+def iter_store_format(path):
+    with PuzzleStore(path) as store:
+        for index in range(len(store)):
+            yield index + 1, store.puzzle(index), None
+
+
+FORMATS = {
+    'lines': iter_lines_format,
+    'csv': iter_csv_format,
+    'packed': iter_packed_format,
+    'store': iter_store_format,
+}
+
+
+def iter_records(path, format=None):
+    """逐条产出 (记录位置, 题目字符串, 错误说明)，格式正确时错误说明为 None，否则题目为 None"""
+    return FORMATS[format or detect_format(path)](path)
+
+
+def iter_puzzles(path, format=None, on_error=None):
+    """逐个产出题目字符串，格式错误的记录跳过，并以 BadRecord 调用 on_error"""
+    for number, puzzle, error in iter_records(path, format):
+        if error is None:
+            yield puzzle
+        elif on_error is not None:
+            on_error(BadRecord(number, error))
+
+
+def pack_puzzle(puzzle):
+    """把81字符的题目编码为 packed 格式的41字节"""
+    digits = [0 if char in '.0' else int(char) for char in puzzle.strip()] + [0]
+    if len(digits) != 82:
+        raise ValueError(f'需要81个字符，实际为{len(digits) - 1}个')
+    return bytes(digits[i] << 4 | digits[i + 1] for i in range(0, 82, 2))
+
+
+def write_packed(puzzles, path):
+    """把题目写入 packed 格式的文件，返回写入的题目数"""
+    count = 0
+    with open(path, 'wb') as file:
+        for puzzle in puzzles:
+            file.write(pack_puzzle(puzzle))
+            count += 1
+    return count
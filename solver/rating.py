@@ -0,0 +1,104 @@
+"""按解题方法评定题目难度
+
+评级时按 TECHNIQUES 的顺序（从易到难）逐步求解，每一步总是使用能取得进展的最简单方法，
+记录每个方法成功的次数和用到的最难方法；逻辑方法无法继续时回退到回溯搜索，记为 'search'。
+不记录解题步骤，也不计时，开销与 trace=False 的 solve() 相当。
+
+分数 = 最难方法的权重 + min(0.99, 各方法权重 × 次数之和 / 1000)，
+整数部分由最难方法决定，小数部分区分同一档中步骤多少。
+"""
+from solver.board import TECHNIQUE_NAMES, TECHNIQUES, SudokuBoard
+from solver.cache import PersistentLRU
+
+# 各方法的难度权重，按 TECHNIQUES 的顺序递增
+WEIGHTS = dict(zip(TECHNIQUE_NAMES, (1.0, 1.5, 3.0, 3.2, 3.4, 3.6, 3.8, 4.0, 4.2, 5.0, 5.2, 5.4)))
+WEIGHTS['search'] = 10.0
+
+
+def count_techniques(board, techniques=TECHNIQUES):
+    """只用 techniques 逐步求解，返回每个方法成功的次数列表（与 techniques 对应）
+
+    无法继续时停止，调用方用 board.is_solved() 判断是否已经解出。
+    """
+    counts = [0] * len(techniques)
+    while not board.is_solved():
+        for level, (_, method, args) in enumerate(techniques):
+            if getattr(board, method)(*args):
+                counts[level] += 1
+                break
+        else:
+            break
+    return counts
+
+
+class Rating:
+    """一个题目的难度评级
+
+    hardest 为用到的最难方法（题目已经填满时为 None），counts 为各方法成功的次数，
+    score 为数字分数，无解的题目 score 为 None。
+    """
+
+    __slots__ = ('hardest', 'counts', 'score')
+
+    def __init__(self, hardest, counts, score):
+        self.hardest = hardest
+        self.counts = counts
+        self.score = score
+
+    @property
+    def solved(self):
+        return self.score is not None
+
+    def to_dict(self):
+        return {'hardest': self.hardest, 'counts': self.counts, 'score': self.score}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['hardest'], data['counts'], data['score'])
+
+    def __repr__(self):
+        return f'Rating({self.hardest!r}, {self.counts!r}, {self.score!r})'
+
+
+def rate_board(board):
+    """评定 SudokuBoard 当前盘面的难度，盘面会被解出"""
+    if board.has_conflicts():
+        return Rating(None, {}, None)
+    counts = {name: count for name, count in zip(TECHNIQUE_NAMES, count_techniques(board)) if count}
+    if not board.is_solved():
+        if not board.solve_search():
+            return Rating(None, counts, None)
+        counts['search'] = 1
+    if not counts:
+        return Rating(None, counts, 0.0)
+    hardest = max(counts, key=WEIGHTS.__getitem__)
+    effort = sum(WEIGHTS[name] * count for name, count in counts.items())
+    return Rating(hardest, counts, round(WEIGHTS[hardest] + min(0.99, effort / 1000), 2))
+
+
+def rate(puzzle):
+    """评定81字符题目的难度，格式错误时抛出 ValueError"""
+    return rate_board(SudokuBoard.from_string(puzzle, trace=False))
+
+
+class RatingCache(PersistentLRU):
+    """按题目缓存评级结果，题目中的'0'和'.'视为相同"""
+
+    TABLE = 'ratings'
+
+    def encode(self, rating):
+        return rating.to_dict()
+
+    def decode(self, data):
+        return Rating.from_dict(data)
+
+    def rate(self, puzzle):
+        key = puzzle.strip().replace('0', '.')
+        rating = self.get(key)
+        if rating is None:
+            self.misses += 1
+            rating = rate(key)
+            self.put(key, rating)
+        else:
+            self.hits += 1
+        return rating
@@ -0,0 +1,358 @@
+"""本机求解服务
+
+服务端在 Unix 域套接字或本机 TCP 端口上监听，协议为每行一个 JSON：
+    请求  {"id": 1, "op": "solve", "puzzle": "..81个字符..", "timeout": 2.0}
+    响应  {"id": 1, "ok": true, "solution": "..."}
+          {"id": 1, "ok": false, "error": "timeout"}
+op 可以是 solve（返回 solution）、rate（返回 rating）或 steps（返回 solution 和 steps）。
+error 为 invalid（题目格式错误）、unsolvable（无解）、timeout（超过期限）或 bad_request（请求格式错误）。
+同一连接上的请求可以连续发送，响应按完成顺序返回，用 id 对应。
+
+同时到达的请求在 batch_delay 内凑成最多 batch_size 个一批，交给进程池求解，
+在途的批次数不超过工作进程数。等待队列满时不再读取连接上的新请求，每个连接的在途请求数也有上限，
+以此向调用方施加反压。每个请求都有期限，超过期限的请求直接返回 timeout；
+已过期的请求不会被求解，工作进程处理一批请求时也会跳过排在后面、已经过期的请求。
+
+用法：
+    python -m solver serve --socket /tmp/sudoku.sock
+    python -m solver request --socket /tmp/sudoku.sock solve puzzles.txt
+"""
+import asyncio
+import json
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from solver.board import SudokuBoard
+from solver.cache import SolutionCache
+from solver.rating import RatingCache, rate
+
+OPS = ('solve', 'rate', 'steps')
+
+
+def run_request(op, puzzle, cache=None):
+    """在工作进程中处理一个请求，返回响应中的结果字段，失败时包含 error"""
+    try:
+        if op == 'rate':
+            rating = cache[1].rate(puzzle) if cache else rate(puzzle)
+            if not rating.solved:
+                return {'error': 'unsolvable'}
+            return {'rating': rating.to_dict()}
+        trace = op == 'steps'
+        if cache:
+            solution, steps = cache[0].solve(puzzle, trace=trace)
+        else:
+            solver = SudokuBoard.from_string(puzzle, trace=trace)
+            solution = solver.to_string() if not solver.has_conflicts() and solver.solve() else None
+            steps = solver.solution_steps
+    except ValueError as error:
+        return {'error': 'invalid', 'message': str(error)}
+    if solution is None:
+        return {'error': 'unsolvable'}
+    if not trace:
+        return {'solution': solution}
+    return {'solution': solution, 'steps': [step.to_dict() for step in steps]}
+
+
+# 每个工作进程各自的 (SolutionCache, RatingCache)，在第一次使用时创建
+_caches = None
+
+
+def run_batch(requests, cache=None):
+    """在工作进程中处理一批 (op, 题目, 期限) 请求
+
+    期限为 time.time() 的时刻，开始处理时已经过期的请求直接返回 timeout。
+    cache 为缓存配置 (条目数, SQLite 文件)，为 None 时不使用缓存。
+    """
+    global _caches
+    if cache is not None and _caches is None:
+        _caches = (SolutionCache(*cache), RatingCache(*cache))
+    results = []
+    for op, puzzle, deadline in requests:
+        if time.time() > deadline:
+            results.append({'error': 'timeout'})
+        else:
+            results.append(run_request(op, puzzle, _caches if cache is not None else None))
+    return results
+
+
+class Pending:
+    """等待求解的请求"""
+
+    __slots__ = ('op', 'puzzle', 'deadline', 'future')
+
+    def __init__(self, op, puzzle, deadline, future):
+        self.op = op
+        self.puzzle = puzzle
+        self.deadline = deadline
+        self.future = future
+
+
+class SolveService:
+    """把请求凑成小批次交给进程池的求解服务
+
+    jobs 为工作进程数；batch_size、batch_delay（秒）控制凑批；queue_size 为等待队列长度；
+    timeout 为请求没有指定期限时使用的默认期限（秒）；max_inflight 为每个连接的在途请求上限；
+    cache 为缓存配置 (条目数, SQLite 文件)，不为 None 时每个工作进程缓存求解和评级结果。
+    """
+
+    def __init__(self, jobs=None, batch_size=64, batch_delay=0.002, queue_size=1024,
+                 timeout=10.0, max_inflight=256, cache=None):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.max_inflight = max_inflight
+        self.cache = cache
+        self.queue = None
+        self.executor = None
+        self.slots = None
+        self.batcher = None
+        self.running = set()
+
+    async def start(self):
+        self.queue = asyncio.Queue(self.queue_size)
+        self.slots = asyncio.Semaphore(self.jobs)
+        self.executor = ProcessPoolExecutor(self.jobs)
+        self.batcher = asyncio.create_task(self._batch_loop())
+
+    async def close(self):
+        if self.batcher is not None:
+            self.batcher.cancel()
+            self.batcher = None
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    async def submit(self, op, puzzle, timeout=None):
+        """提交一个请求并等待结果，超过期限时抛出 asyncio.TimeoutError，op 无效时抛出 ValueError"""
+        if op not in OPS:
+            raise ValueError(f'未知的操作: {op}')
+        if not isinstance(puzzle, str):
+            raise ValueError('puzzle 必须是字符串')
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        pending = Pending(op, puzzle, loop.time() + timeout, loop.create_future())
+
+        async def wait():
+            # 队列满时在这里等待，等待时间也计入期限
+            await self.queue.put(pending)
+            return await pending.future
+
+        return await asyncio.wait_for(wait(), timeout)
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            end = loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                remaining = end - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # 已经超时或被取消的请求不再求解
+            now = loop.time()
+            batch = [pending for pending in batch if not pending.future.done() and pending.deadline > now]
+            if not batch:
+                continue
+            # 在途批次不超过工作进程数，其余请求留在队列中形成反压
+            await self.slots.acquire()
+            task = asyncio.create_task(self._run(batch))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        # 工作进程中没有事件循环的时钟，期限换算为 time.time() 的时刻
+        offset = time.time() - loop.time()
+        requests = [(pending.op, pending.puzzle, pending.deadline + offset) for pending in batch]
+        try:
+            results = await loop.run_in_executor(self.executor, run_batch, requests, self.cache)
+        except Exception as error:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(error)
+        else:
+            for pending, result in zip(batch, results):
+                if not pending.future.done():
+                    pending.future.set_result(result)
+        finally:
+            self.slots.release()
+
+    async def handle_connection(self, reader, writer):
+        """处理一个连接：逐行读取请求，每个请求单独等待结果，完成后写回响应"""
+        inflight = asyncio.Semaphore(self.max_inflight)
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                # 在途请求达到上限时暂停读取，调用方的写入随之阻塞
+                await inflight.acquire()
+                line = await reader.readline()
+                if not line:
+                    inflight.release()
+                    break
+                task = asyncio.create_task(self._respond(line, writer, lock, inflight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, line, writer, lock, inflight):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            result = await self.submit(request.get('op'), request.get('puzzle'), request.get('timeout'))
+            response = {'id': request_id, 'ok': 'error' not in result, **result}
+        except asyncio.TimeoutError:
+            response = {'id': request_id, 'ok': False, 'error': 'timeout'}
+        except (ValueError, AttributeError, TypeError) as error:
+            response = {'id': request_id, 'ok': False, 'error': 'bad_request', 'message': str(error)}
+        except Exception as error:
+            response = {'id': request_id, 'ok': False, 'error': 'internal', 'message': str(error)}
+        try:
+            async with lock:
+                writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+        finally:
+            inflight.release()
+
+
+async def serve(service, path=None, host='127.0.0.1', port=8765, ready=None):
+    """启动服务并一直运行，path 不为空时监听 Unix 域套接字，否则监听 host:port
+
+    ready 为回调函数，服务开始监听后以监听地址调用一次。收到 SIGTERM 时停止服务并清理套接字文件。
+    """
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    await service.start()
+    try:
+        if path:
+            if os.path.exists(path):
+                os.unlink(path)
+            server = await asyncio.start_unix_server(service.handle_connection, path)
+            address = path
+        else:
+            server = await asyncio.start_server(service.handle_connection, host, port)
+            address = '%s:%d' % server.sockets[0].getsockname()[:2]
+        if ready is not None:
+            ready(address)
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+        if path and os.path.exists(path):
+            os.unlink(path)
+
+
+class ServiceError(Exception):
+    """服务返回的错误，code 为响应中的 error 字段"""
+
+    def __init__(self, code, message=None):
+        super().__init__(f'{code}: {message}' if message else code)
+        self.code = code
+
+
+class SolveClient:
+    """求解服务的同步客户端
+
+    path 不为空时连接 Unix 域套接字，否则连接 host:port。
+    """
+
+    def __init__(self, path=None, host='127.0.0.1', port=8765):
+        if path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection((host, port))
+        self.file = self.sock.makefile('rwb')
+        self.next_id = 0
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _send(self, op, puzzle, timeout=None):
+        self.next_id += 1
+        request = {'id': self.next_id, 'op': op, 'puzzle': puzzle}
+        if timeout is not None:
+            request['timeout'] = timeout
+        self.file.write(json.dumps(request).encode('utf-8') + b'\n')
+        return self.next_id
+
+    def _receive(self):
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError('服务已关闭连接')
+        return json.loads(line)
+
+    def request(self, op, puzzle, timeout=None):
+        """发送一个请求并返回响应字典"""
+        request_id = self._send(op, puzzle, timeout)
+        self.file.flush()
+        while True:
+            response = self._receive()
+            if response.get('id') == request_id:
+                return response
+
+    def map(self, op, puzzles, timeout=None, window=256):
+        """连续发送多个请求，按题目顺序逐个产出响应字典，同时在途的请求不超过 window 个"""
+        puzzles = iter(puzzles)
+        order, done = [], {}
+        exhausted = False
+        while True:
+            while not exhausted and len(order) < window:
+                puzzle = next(puzzles, None)
+                if puzzle is None:
+                    exhausted = True
+                    break
+                order.append(self._send(op, puzzle, timeout))
+            if not order:
+                return
+            self.file.flush()
+            # 响应按完成顺序到达，先缓存，再按发送顺序产出
+            while order[0] not in done:
+                response = self._receive()
+                done[response.get('id')] = response
+            while order and order[0] in done:
+                yield done.pop(order.pop(0))
+
+    def _result(self, op, puzzle, timeout):
+        response = self.request(op, puzzle, timeout)
+        if not response['ok']:
+            raise ServiceError(response['error'], response.get('message'))
+        return response
+
+    def solve(self, puzzle, timeout=None):
+        """返回题目的解，失败时抛出 ServiceError"""
+        return self._result('solve', puzzle, timeout)['solution']
+
+    def rate(self, puzzle, timeout=None):
+        """返回题目的评级字典（hardest、counts、score）"""
+        return self._result('rate', puzzle, timeout)['rating']
+
+    def steps(self, puzzle, timeout=None):
+        """返回 (解, 解题步骤字典列表)"""
+        response = self._result('steps', puzzle, timeout)
+        return response['solution'], response['steps']
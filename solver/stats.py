@@ -0,0 +1,97 @@
+"""解题方法的计数和计时
+
+SudokuBoard 在创建时传入 stats=True（或一个 SolverStats 对象以便多个盘面共用）后，
+每个解题方法的调用次数、命中次数、扫描的格子数和累计耗时都会被记录下来；
+不开启时只多一次 None 判断。
+"""
+from time import perf_counter
+
+# 统计项的中文名称，未列出的使用原名
+LABELS = {
+    'single_candidate': '唯一候选数法',
+    'single_position': '唯一位置法',
+    'naked_pairs': '显性数对法',
+    'naked_triples': '显性三数组法',
+    'naked_quads': '显性四数组法',
+    'hidden_pairs': '隐性数对法',
+    'hidden_triples': '隐性三数组法',
+    'hidden_quads': '隐性四数组法',
+    'block_line_reduction': '区块摒除法',
+    'x_wing': 'X翼法',
+    'swordfish': '剑鱼法',
+    'jellyfish': '水母法',
+    'search': '回溯搜索',
+    'place': '填数后更新候选数',
+    'update_candidates': '重建全部候选数',
+}
+
+
+class TechniqueStats:
+    """单个解题方法的统计"""
+
+    __slots__ = ('calls', 'hits', 'cells', 'seconds')
+
+    def __init__(self, calls=0, hits=0, cells=0, seconds=0.0):
+        self.calls = calls
+        self.hits = hits
+        self.cells = cells
+        self.seconds = seconds
+
+    def to_dict(self):
+        return {'calls': self.calls, 'hits': self.hits, 'cells': self.cells, 'seconds': self.seconds}
+
+
+class SolverStats:
+    """按解题方法汇总的统计"""
+
+    def __init__(self):
+        self.techniques = {}
+
+    def get(self, name):
+        record = self.techniques.get(name)
+        if record is None:
+            record = self.techniques[name] = TechniqueStats()
+        return record
+
+    def measure(self, board, name, technique):
+        """调用解题方法并记录耗时、命中和扫描的格子数，返回方法的结果"""
+        record = self.get(name)
+        scanned = board.scanned
+        start = perf_counter()
+        found = technique()
+        record.seconds += perf_counter() - start
+        record.calls += 1
+        record.hits += bool(found)
+        record.cells += board.scanned - scanned
+        return found
+
+    def add(self, name, seconds, cells=0):
+        """记录一次不属于解题方法的操作，例如更新候选数"""
+        record = self.get(name)
+        record.calls += 1
+        record.cells += cells
+        record.seconds += seconds
+
+    def merge(self, other):
+        """合并另一个统计对象或其 to_dict() 的结果"""
+        items = other.items() if isinstance(other, dict) else other.to_dict().items()
+        for name, values in items:
+            record = self.get(name)
+            record.calls += values['calls']
+            record.hits += values['hits']
+            record.cells += values['cells']
+            record.seconds += values['seconds']
+
+    def reset(self):
+        self.techniques.clear()
+
+    def to_dict(self):
+        return {name: record.to_dict() for name, record in self.techniques.items()}
+
+    def lines(self):
+        """格式化为逐行的统计文本"""
+        rows = [f"{'方法':<12}{'调用':>8}{'命中':>8}{'扫描格':>10}{'耗时ms':>10}"]
+        for name, record in self.techniques.items():
+            rows.append(f'{LABELS.get(name, name):<12}{record.calls:>8}{record.hits:>8}'
+                        f'{record.cells:>10}{record.seconds * 1000:>10.2f}')
+        return rows
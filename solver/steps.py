@@ -0,0 +1,203 @@
+"""解题步骤记录
+
+Step 只保存方法类型、涉及的格子序号、数字和单元编号，
+说明文字在界面或导出需要时才生成，求解过程中不做任何字符串格式化。
+"""
+from solver.units import geometry_for_cells
+
+# 数组大小对应的名称
+SUBSET_NAMES = {2: '数对', 3: '三数组', 4: '四数组'}
+# 鱼形方法对应的名称
+FISH_NAMES = {'x_wing': 'X翼', 'swordfish': '剑鱼', 'jellyfish': '水母'}
+# 会填入数字的步骤类型，其余类型只删除候选数
+PLACEMENT_TYPES = ('single_candidate', 'single_position', 'search')
+# value 为数字列表的步骤类型
+LIST_VALUE_TYPES = (
+    'naked_pairs', 'naked_triples', 'naked_quads',
+    'hidden_pairs', 'hidden_triples', 'hidden_quads', 'search',
+)
+
+
+def unit_name(unit, size=9):
+    """返回单元的中文名称，例如“第3行”、“第5列”、“第2宫格”，size 为盘面边长"""
+    kind, index = divmod(unit, size)
+    return f'第{index+1}' + ('行', '列', '宫格')[kind]
+
+
+def format_digit(num, size=9):
+    """把数字格式化为盘面上显示的字符，大于9的数字为字母"""
+    return geometry_for_cells(size * size).digit_chars[num - 1]
+
+
+def format_digits(digits, size=9):
+    """把一组数字格式化为“(1, 2)”的形式"""
+    return '(' + ', '.join(format_digit(num, size) for num in digits) + ')'
+
+
+def format_positions(positions):
+    """把格子坐标格式化为从1开始的“(行,列)”列表"""
+    return '、'.join(f'({row+1},{col+1})' for row, col in positions)
+
+
+def format_lines(units, size=9):
+    """把同为行或同为列的单元格式化为“第1、5行”的形式"""
+    return '第' + '、'.join(str(unit % size + 1) for unit in units) + ('行', '列')[units[0] // size]
+
+
+def _describe_single_candidate(step):
+    row, col = step.position
+    return f'在位置({row+1},{col+1})填入数字{format_digit(step.digits[0], step.size)}'
+
+
+def _describe_single_position(step):
+    row, col = step.position
+    num = format_digit(step.digits[0], step.size)
+    return f'在{unit_name(step.units[0], step.size)}中，数字{num}只能放在位置({row+1},{col+1})'
+
+
+def _describe_naked_subset(step):
+    digits = format_digits(step.digits, step.size)
+    return (f'在{unit_name(step.units[0], step.size)}找到{SUBSET_NAMES[len(step.digits)]}{digits}，'
+            f'可以从其他格子删除这些数字')
+
+
+def _describe_hidden_subset(step):
+    digits = format_digits(step.digits, step.size)
+    return (f'在{unit_name(step.units[0], step.size)}中，数字{digits}只能出现在{format_positions(step.positions)}，'
+            f'这些格子的其他候选数可以删除')
+
+
+def _describe_block_line_reduction(step):
+    source, target = step.units
+    size = step.size
+    # 宫格对行/列摒除时删除的是其他宫格中的数字，行/列对宫格摒除时删除的是宫格中其他格子的数字
+    rest = '其他宫格' if source >= 2 * size else '其他格子'
+    return (f'数字{format_digit(step.digits[0], size)}在{unit_name(source, size)}中只能出现在{unit_name(target, size)}，'
+            f'因此可以从{unit_name(target, size)}的{rest}中删除该数字')
+
+
+def _describe_fish(step):
+    count = len(step.units) // 2
+    base, cover = step.units[:count], step.units[count:]
+    size = step.size
+    num = format_digit(step.digits[0], size)
+    return (f'数字{num}在{format_lines(base, size)}中只能出现在{format_lines(cover, size)}，'
+            f'构成{FISH_NAMES[step.type]}，可以从这些{("行", "列")[cover[0] // size]}的其他格子中删除数字{num}')
+
+
+def _describe_search(step):
+    return f'逻辑方法无法继续，通过回溯搜索填入剩余的{len(step.cells)}个数字'
+
+
+DESCRIPTIONS = {
+    'single_candidate': _describe_single_candidate,
+    'single_position': _describe_single_position,
+    'naked_pairs': _describe_naked_subset,
+    'naked_triples': _describe_naked_subset,
+    'naked_quads': _describe_naked_subset,
+    'hidden_pairs': _describe_hidden_subset,
+    'hidden_triples': _describe_hidden_subset,
+    'hidden_quads': _describe_hidden_subset,
+    'block_line_reduction': _describe_block_line_reduction,
+    'x_wing': _describe_fish,
+    'swordfish': _describe_fish,
+    'jellyfish': _describe_fish,
+    'search': _describe_search,
+}
+
+REASONS = {
+    'single_candidate': lambda step: f'该位置只有一个候选数{format_digit(step.digits[0], step.size)}，其他数字都被行、列或宫格中的数字排除',
+    'search': lambda step: '优先试填候选数最少的格子，并用唯一候选数和唯一位置推理尽早排除矛盾分支',
+}
+
+
+class Step:
+    """一个解题步骤
+
+    type 为方法类型，cells 为涉及的格子序号，digits 为涉及的数字，
+    units 为相关的单元编号（9x9盘面上0-8行、9-17列、18-26宫），size 为盘面边长。
+    为了兼容原来的字典格式，也支持 step['type']、step['description'] 等访问方式。
+    """
+
+    __slots__ = ('type', 'cells', 'digits', 'units', 'size')
+
+    def __init__(self, type, cells, digits, units=(), size=9):
+        self.type = type
+        self.cells = cells
+        self.digits = digits
+        self.units = units
+        self.size = size
+
+    @property
+    def positions(self):
+        """涉及格子的 (行, 列) 坐标列表"""
+        return [divmod(idx, self.size) for idx in self.cells]
+
+    @property
+    def position(self):
+        """单个格子的步骤返回 (行, 列)，多个格子的步骤返回坐标列表"""
+        if self.type in ('single_candidate', 'single_position'):
+            return divmod(self.cells[0], self.size)
+        return self.positions
+
+    @property
+    def value(self):
+        """数组和搜索步骤返回数字列表，其余步骤返回单个数字"""
+        if self.type in LIST_VALUE_TYPES:
+            return list(self.digits)
+        return self.digits[0]
+
+    @property
+    def description(self):
+        return DESCRIPTIONS[self.type](self)
+
+    @property
+    def reason(self):
+        reason = REASONS.get(self.type)
+        return reason(self) if reason else None
+
+    def placements(self):
+        """返回该步骤填入的 (行, 列, 数字) 列表，删除候选数的步骤返回空列表"""
+        if self.type not in PLACEMENT_TYPES:
+            return []
+        return [divmod(idx, self.size) + (num,) for idx, num in zip(self.cells, self.digits)]
+
+    def to_dict(self):
+        """转换为原来的字典格式"""
+        step = {
+            'type': self.type,
+            'position': self.position,
+            'value': self.value,
+            'description': self.description,
+        }
+        if self.type in REASONS:
+            step['reason'] = self.reason
+        return step
+
+    def __getitem__(self, key):
+        if key == 'reason' and self.type not in REASONS:
+            raise KeyError(key)
+        if key not in ('type', 'position', 'value', 'description', 'reason'):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        if key == 'reason':
+            return self.type in REASONS
+        return key in ('type', 'position', 'value', 'description')
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other):
+        if not isinstance(other, Step):
+            return NotImplemented
+        return ((self.type, self.cells, self.digits, self.units, self.size)
+                == (other.type, other.cells, other.digits, other.units, other.size))
+
+    def __repr__(self):
+        size = f', size={self.size!r}' if self.size != 9 else ''
+        return f'Step({self.type!r}, {self.cells!r}, {self.digits!r}, {self.units!r}{size})'
@@ -0,0 +1,277 @@
+"""按列存放的题目库文件
+
+文件由32字节的文件头和依次排列的各列组成，每列连续存放所有题目的同一种数据：
+    文件头  魔数 b'SDKSTORE'、版本、宫格边长、编码、列标志和题目数（见 HEADER）
+    题目列  每个题目 n*n 字节，每个格子一个字节，0为空格；
+            9x9的题目也可以用41字节的半字节编码（与 solver.importer 的 packed 格式相同，高4位在前）
+    解列    可选，编码与题目列相同，无解的题目全为0
+    评级列  可选，每个题目一个小端 float32 分数（见 solver.rating），没有评级的题目为 NaN
+
+读取时整个文件被内存映射，按序号或切片取出的记录是映射上的 memoryview，不复制数据；
+安装了NumPy时 array() 返回共享同一映射的数组，题目列的形状为 (N, n, n)；solver.batch 只支持9x9，
+因此只有9x9题库的数组可以直接交给它。
+因此上千万题的文件也能立即打开并随机访问，内存占用与题目数无关。
+SudokuBoard.from_view 可以直接从一条记录创建盘面。
+"""
+import math
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+from solver.board import SudokuBoard
+from solver.units import BOX_SIZES, STANDARD, geometry
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 是可选依赖，只有 array() 需要
+    np = None
+
+MAGIC = b'SDKSTORE'
+VERSION = 1
+# 魔数、版本、宫格边长、编码、列标志、题目数，补齐到32字节
+HEADER = struct.Struct('<8sBBBBQ12x')
+RATING = struct.Struct('<f')
+
+# 题目和解的编码：每个格子一个字节，或9x9题目每个格子半个字节
+BYTES = 0
+NIBBLES = 1
+NIBBLE_SIZE = (STANDARD.cell_count + 1) // 2
+
+# 列标志，题目列总是存在
+PUZZLES = 0
+SOLUTIONS = 1
+RATINGS = 2
+COLUMN_NAMES = {PUZZLES: '题目', SOLUTIONS: '解', RATINGS: '评级'}
+
+# 每个尺寸的字符到格子值的转换表，无效字符转换为0xFF
+ENCODE_TABLES = {}
+for _box in BOX_SIZES:
+    _table = bytearray([0xFF]) * 256
+    _table[ord('.')] = _table[ord('0')] = 0
+    for _num, _char in enumerate(geometry(_box).digit_chars, 1):
+        _table[ord(_char)] = _table[ord(_char.lower())] = _num
+    ENCODE_TABLES[_box] = bytes(_table)
+# 每个尺寸的格子值到字符的转换表，0为'.'
+DECODE_TABLES = {
+    box: (b'.' + geometry(box).digit_chars.encode('ascii')).ljust(256, b'?') for box in BOX_SIZES
+}
+# 半字节编码中每个字节对应的两个格子值，以及把格子值移到高4位的转换表
+NIBBLE_PAIRS = tuple(bytes(divmod(byte, 16)) for byte in range(256))
+HIGH_NIBBLE = bytes(value << 4 & 0xFF for value in range(256))
+
+
+def encode_record(puzzle, geometry=STANDARD, encoding=BYTES):
+    """把题目字符串编码为一条记录，格式错误时抛出 ValueError"""
+    data = puzzle.strip().encode('ascii')
+    if len(data) != geometry.cell_count:
+        raise ValueError(f'需要{geometry.cell_count}个字符，实际为{len(data)}个')
+    values = data.translate(ENCODE_TABLES[geometry.box])
+    if 0xFF in values:
+        raise ValueError(f'无效字符: {chr(data[values.index(0xFF)])!r}')
+    if encoding == NIBBLES:
+        # 高4位和低4位各自拼成一个整数后按位或，避免逐个格子循环
+        high = int.from_bytes(values[::2].translate(HIGH_NIBBLE), 'big')
+        return (high | int.from_bytes(values[1::2] + b'\0', 'big')).to_bytes(NIBBLE_SIZE, 'big')
+    return values
+
+
+def decode_values(record, cell_count=STANDARD.cell_count):
+    """把一条记录还原为每个格子一个字节的格子值，半字节编码的记录按 cell_count 截断"""
+    if len(record) == NIBBLE_SIZE and cell_count == STANDARD.cell_count:
+        return b''.join(map(NIBBLE_PAIRS.__getitem__, record))[:cell_count]
+    return bytes(record)
+
+
+class StoreWriter:
+    """逐个追加题目的写入器，关闭时写入文件头
+
+    box 为宫格边长；encoding 为 BYTES 或 NIBBLES（只支持9x9）；solutions、ratings 为真时写入对应的列。
+    解和评级先写入临时文件，关闭时接在题目列之后，因此不需要事先知道题目数。
+    """
+
+    def __init__(self, path, box=3, encoding=BYTES, solutions=False, ratings=False):
+        if encoding == NIBBLES and box != 3:
+            raise ValueError('半字节编码只支持9x9的题目')
+        self.geometry = geometry(box)
+        self.encoding = encoding
+        self.record_size = NIBBLE_SIZE if encoding == NIBBLES else self.geometry.cell_count
+        self.solutions = tempfile.TemporaryFile() if solutions else None
+        self.ratings = tempfile.TemporaryFile() if ratings else None
+        self.count = 0
+        self.file = open(path, 'wb')
+        # 先占住文件头的位置，关闭时写入题目数
+        self.file.write(bytes(HEADER.size))
+
+    def add(self, puzzle, solution=None, rating=None):
+        """追加一个题目，没有解或评级时对应的列写入全0或 NaN，格式错误时抛出 ValueError"""
+        record = encode_record(puzzle, self.geometry, self.encoding)
+        if self.solutions is not None:
+            solution = encode_record(solution, self.geometry, self.encoding) if solution else bytes(self.record_size)
+        self.file.write(record)
+        if self.solutions is not None:
+            self.solutions.write(solution)
+        if self.ratings is not None:
+            self.ratings.write(RATING.pack(math.nan if rating is None else rating))
+        self.count += 1
+
+    def close(self):
+        if self.file.closed:
+            return
+        columns = 0
+        for flag, column in ((SOLUTIONS, self.solutions), (RATINGS, self.ratings)):
+            if column is not None:
+                column.seek(0)
+                shutil.copyfileobj(column, self.file)
+                column.close()
+                columns |= flag
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.geometry.box, self.encoding, columns, self.count))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_store(path, puzzles, box=3, encoding=BYTES):
+    """把题目字符串写入题目库文件（只有题目列），返回写入的题目数"""
+    with StoreWriter(path, box, encoding) as writer:
+        for puzzle in puzzles:
+            writer.add(puzzle)
+    return writer.count
+
+
+class PuzzleStore:
+    """内存映射的题目库
+
+    len(store) 为题目数，store[i] 和 store[i:j] 为题目列上的 memoryview（切片为连续的多条记录），
+    view() 可以取其他列。取出的 memoryview 和数组引用着映射，关闭前需要先释放。
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        try:
+            if os.fstat(self.file.fileno()).st_size < HEADER.size:
+                raise ValueError(f'{path}: 不是题目库文件')
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self.file.close()
+            raise
+        self.buffer = memoryview(self.map)
+        try:
+            self._read_header(path)
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_header(self, path):
+        magic, version, box, encoding, columns, count = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f'{path}: 不是题目库文件')
+        if version != VERSION:
+            raise ValueError(f'{path}: 不支持的版本 {version}')
+        if box not in BOX_SIZES or encoding not in (BYTES, NIBBLES) or encoding == NIBBLES and box != 3:
+            raise ValueError(f'{path}: 文件头损坏')
+        self.geometry = geometry(box)
+        self.encoding = encoding
+        self.count = count
+        self.record_size = NIBBLE_SIZE if encoding == NIBBLES else self.geometry.cell_count
+        # 每列的 (起始位置, 每条记录的字节数)
+        self.columns = {PUZZLES: (HEADER.size, self.record_size)}
+        offset = HEADER.size + count * self.record_size
+        for flag, size in ((SOLUTIONS, self.record_size), (RATINGS, RATING.size)):
+            if columns & flag:
+                self.columns[flag] = (offset, size)
+                offset += count * size
+        if offset != len(self.map):
+            raise ValueError(f'{path}: 文件长度应为{offset}字节，实际为{len(self.map)}字节')
+
+    def close(self):
+        """释放映射并关闭文件，仍有取出的 memoryview 或数组时抛出 BufferError"""
+        if self.file.closed:
+            return
+        self.buffer.release()
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return self.view(index)
+
+    def has_column(self, column):
+        return column in self.columns
+
+    def _column(self, column):
+        if column not in self.columns:
+            raise KeyError(f'题目库中没有{COLUMN_NAMES.get(column, column)}列')
+        return self.columns[column]
+
+    def view(self, index, column=PUZZLES):
+        """第 index 条记录（或切片中连续的多条记录）在映射上的 memoryview，不复制数据"""
+        offset, size = self._column(column)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.count)
+            if step != 1:
+                raise ValueError('只支持步长为1的切片')
+            return self.buffer[offset + start * size:offset + max(start, stop) * size]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('题目序号超出范围')
+        return self.buffer[offset + index * size:offset + index * size + size]
+
+    def decode(self, record):
+        """把一条题目或解的记录转换为字符串，空格为'.'"""
+        values = decode_values(record, self.geometry.cell_count)
+        return values.translate(DECODE_TABLES[self.geometry.box]).decode('ascii')
+
+    def puzzle(self, index):
+        """第 index 个题目的字符串"""
+        return self.decode(self.view(index))
+
+    def solution(self, index):
+        """第 index 个题目的解，没有解时为 None"""
+        record = self.view(index, SOLUTIONS)
+        return self.decode(record) if any(record) else None
+
+    def rating(self, index):
+        """第 index 个题目的评级分数，没有评级时为 None"""
+        score = RATING.unpack(self.view(index, RATINGS))[0]
+        # float32 存不下精确的两位小数，还原为评级时的精度
+        return None if math.isnan(score) else round(score, 2)
+
+    def board(self, index, **kwargs):
+        """用第 index 个题目创建 SudokuBoard，kwargs 传给 SudokuBoard"""
+        return SudokuBoard.from_view(self.view(index), **kwargs)
+
+    def __iter__(self):
+        """按顺序产出题目字符串"""
+        for index in range(self.count):
+            yield self.puzzle(index)
+
+    def array(self, column=PUZZLES):
+        """整列数据的 NumPy 数组，与映射共享内存（只读）
+
+        每个格子一个字节的题目和解为 (N, n, n) 的 uint8 数组，半字节编码为 (N, 41)，评级为 (N,) 的 float32。
+        """
+        if np is None:
+            raise ImportError('array() 需要安装NumPy')
+        offset, size = self._column(column)
+        if column == RATINGS:
+            return np.frombuffer(self.map, dtype='<f4', count=self.count, offset=offset)
+        data = np.frombuffer(self.map, dtype=np.uint8, count=self.count * size, offset=offset)
+        if self.encoding == NIBBLES:
+            return data.reshape(self.count, size)
+        return data.reshape(self.count, self.geometry.size, self.geometry.size)
@@ -0,0 +1,125 @@
+"""数独的格子、单元和同组格子索引表
+
+边长为 n = box² 的盘面（4x4、9x9、16x16、25x25）由 Geometry 描述，
+格子按 row*n+col 编号，单元按先行、再列、后宫编号。所有表在第一次使用某个尺寸时计算一次，
+之后只读，供 solver 和 gui 共用，避免在循环中重复计算宫格坐标。
+模块级的常量为标准9x9盘面的表。
+"""
+from functools import lru_cache
+
+# 各尺寸共用的数字字符：数字n显示为 DIGIT_CHARS[n-1]，16x16 为1-9和A-G，25x25 为1-9和A-P
+DIGIT_CHARS = '123456789ABCDEFGHIJKLMNOP'
+# 支持的宫格边长
+BOX_SIZES = (2, 3, 4, 5)
+
+
+class Geometry:
+    """边长为 box² 的盘面的全部索引表
+
+    size 为边长，cell_count 为格子数，all_digits 为全部数字的掩码；
+    units 中 0..size-1 为行，size..2*size-1 为列，其余为宫。
+    """
+
+    def __init__(self, box):
+        n = box * box
+        self.box = box
+        self.size = n
+        self.cell_count = n * n
+        self.all_digits = (1 << n) - 1
+        self.digit_chars = DIGIT_CHARS[:n]
+
+        self.cells = tuple(range(n * n))
+        # 格子序号对应的 (行, 列) 坐标以及所在的行、列、宫编号
+        self.positions = tuple(divmod(idx, n) for idx in self.cells)
+        self.row_of = tuple(idx // n for idx in self.cells)
+        self.col_of = tuple(idx % n for idx in self.cells)
+        self.box_of = tuple(idx // (n * box) * box + idx % n // box for idx in self.cells)
+
+        # n行、n列、n宫各自包含的格子
+        self.rows = tuple(tuple(range(row * n, row * n + n)) for row in range(n))
+        self.cols = tuple(tuple(range(col, n * n, n)) for col in range(n))
+        self.boxes = tuple(
+            tuple((b // box * box + i // box) * n + b % box * box + i % box for i in range(n))
+            for b in range(n)
+        )
+        self.units = self.rows + self.cols + self.boxes
+        # 每个格子所在的三个单元编号（行、列、宫）
+        self.cell_units = tuple(
+            (self.row_of[idx], n + self.col_of[idx], 2 * n + self.box_of[idx]) for idx in self.cells
+        )
+        # 每个格子的同组格子
+        self.peers = tuple(
+            tuple(sorted(set(self.rows[self.row_of[idx]] + self.cols[self.col_of[idx]]
+                             + self.boxes[self.box_of[idx]]) - {idx}))
+            for idx in self.cells
+        )
+
+        # 每个宫与穿过它的 box 行、box 列的交集，按宫编号分组，先行后列
+        self.box_intersections = tuple(
+            tuple(self._intersection(b, row) for row in range(b // box * box, b // box * box + box))
+            + tuple(self._intersection(b, n + col) for col in range(b % box * box, b % box * box + box))
+            for b in range(n)
+        )
+        self.intersections = tuple(item for group in self.box_intersections for item in group)
+        # 每一行/列（单元编号0到2n-1）与它穿过的 box 个宫的交集
+        self.line_intersections = tuple(
+            tuple(item for item in self.intersections if item[1] == line)
+            for line in range(2 * n)
+        )
+
+    def _intersection(self, box, line):
+        """宫与行/列的交集：(宫编号, 单元编号, 交集格子, 行/列中其余格子, 宫中其余格子)"""
+        common = tuple(idx for idx in self.boxes[box] if idx in self.units[line])
+        line_rest = tuple(idx for idx in self.units[line] if idx not in common)
+        box_rest = tuple(idx for idx in self.boxes[box] if idx not in common)
+        return box, line, common, line_rest, box_rest
+
+    def digit_value(self, char):
+        """把一个字符解析为数字，'.'和'0'为空格（0），无效字符抛出 ValueError"""
+        if char in '.0':
+            return 0
+        num = self.digit_chars.find(char.upper()) + 1
+        if not num:
+            raise ValueError(f'无效字符: {char!r}')
+        return num
+
+
+@lru_cache(maxsize=None)
+def geometry(box=3):
+    """返回宫格边长为 box 的盘面的 Geometry，同一尺寸只计算一次"""
+    if box not in BOX_SIZES:
+        raise ValueError(f'不支持的宫格边长: {box}')
+    return Geometry(box)
+
+
+def geometry_for_cells(count):
+    """按格子数（16、81、256、625）返回 Geometry，不是支持的尺寸时抛出 ValueError"""
+    for box in BOX_SIZES:
+        if box ** 4 == count:
+            return geometry(box)
+    raise ValueError(f'需要{"、".join(str(box ** 4) for box in BOX_SIZES)}个字符之一，实际为{count}个')
+
+
+STANDARD = geometry(3)
+
+CELLS = STANDARD.cells
+POSITIONS = STANDARD.positions
+ROW_OF = STANDARD.row_of
+COL_OF = STANDARD.col_of
+BOX_OF = STANDARD.box_of
+
+# 9行、9列、9宫各自包含的格子
+ROWS = STANDARD.rows
+COLS = STANDARD.cols
+BOXES = STANDARD.boxes
+
+# 27个单元：0-8为行，9-17为列，18-26为宫
+UNITS = STANDARD.units
+# 每个格子所在的三个单元编号（行、列、宫）
+CELL_UNITS = STANDARD.cell_units
+# 每个格子的20个同组格子
+PEERS = STANDARD.peers
+
+BOX_INTERSECTIONS = STANDARD.box_intersections
+INTERSECTIONS = STANDARD.intersections
+LINE_INTERSECTIONS = STANDARD.line_intersections